@@ -2,11 +2,19 @@ import streamlit as st
 import os
 import json
 from datetime import datetime
+from contextlib import nullcontext
+import uuid
 import autogen
-from utils import setup_page, display_results
-from search_engine import create_search_agents, run_search
-from report_generator import generate_report
-from visualizations import create_visualization
+import tracing
+from utils import setup_page, display_results, render_result_card, display_diagnostics
+from search_engine import get_search_agents, result_cache, result_cache_key, llm_response_cache, search_flight
+from report_generator import stream_report, stream_review, report_flight, report_stream_flight, review_stream_flight
+from streaming import TextStream
+from results_store import ResultsStore
+from jobs import job_queue, search_job, TooManyJobs, DONE, FAILED
+
+# How often a session checks its background search for progress, in seconds
+JOB_POLL_INTERVAL = 0.5
 
 # Create a folder for code execution if it doesn't exist
 if not os.path.exists("coding"):
@@ -15,6 +23,9 @@ if not os.path.exists("coding"):
 # Page configuration
 setup_page()
 
+# Pipeline tracing is opt-in via SEARCH_TRACING (log, jsonl, panel)
+tracing.configure_from_env()
+
 # Custom CSS for modern UI (Glassmorphism design)
 st.markdown("""
     <style>
@@ -122,9 +133,84 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize session state variables
-for key in ["search_results", "report", "search_completed", "visualization_data", "agents"]:
+for key in ["active_search", "agents", "pending_search", "job_notice"]:
     if key not in st.session_state:
-        st.session_state[key] = None if key != "search_completed" else False
+        st.session_state[key] = None
+
+# Identifies this session to the job queue for fairness and cancellation
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# Finished searches of this session; reruns and history clicks read from here instead of recomputing
+if "results_store" not in st.session_state:
+    st.session_state.results_store = ResultsStore()
+
+def select_search(search_id):
+    """Show a stored search from the history"""
+    st.session_state.active_search = search_id
+
+@st.fragment(run_every=JOB_POLL_INTERVAL)
+def job_progress():
+    """
+    Poll the session's background search and show its stage and partial results.
+    Only this fragment reruns while the job works; the page reruns once it finishes.
+    """
+    pending = st.session_state.pending_search
+    job = job_queue.get(pending['job_id']) if pending else None
+    if job is None:
+        st.session_state.pending_search = None
+        st.rerun()
+
+    if job.done:
+        st.session_state.pending_search = None
+        if job.status == DONE:
+            search_results, visualization_data = job.result
+            # The report and review are streamed into the Report tab once the page reruns
+            search = st.session_state.results_store.add(
+                pending['query'], search_results, visualization_data, model=pending['model']
+            )
+            st.session_state.active_search = search.id
+            st.session_state.job_notice = ('success', None)
+        elif job.status == FAILED:
+            st.session_state.job_notice = ('error', f"⚠️ Critical error: {job.error}")
+        else:
+            st.session_state.job_notice = ('warning', "Search cancelled.")
+        st.rerun()
+
+    st.progress(job.progress, text=job.stage)
+    if st.button("✖ Cancel search", key="cancel_search"):
+        job_queue.cancel(job.id, st.session_state.session_id)
+        st.session_state.pending_search = None
+        st.session_state.job_notice = ('warning', "Search cancelled.")
+        st.rerun()
+
+    # Live view of the Search Results tab, filled in as each source answers
+    if job.batches:
+        st.subheader("🔍 Search Results (live)")
+        for source, results in list(job.batches):
+            for result in results:
+                render_result_card(result)
+
+@st.fragment
+def export_controls(search):
+    """Report and data downloads; runs as a fragment so a download doesn't rerun the page"""
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="📄 Export Report (MD)",
+            data=search.report or "",
+            file_name=f"report_{search.query.replace(' ', '_')}.md",
+            mime="text/markdown",
+            use_container_width=True
+        )
+    with col2:
+        st.download_button(
+            label="📊 Export Data (JSON)",
+            data=search.fragment('data.json', lambda: json.dumps(search.search_results)),
+            file_name=f"data_{search.query.replace(' ', '_')}.json",
+            mime="application/json",
+            use_container_width=True
+        )
 
 # Main content container
 with st.container():
@@ -179,68 +265,77 @@ with st.container():
                             "api_key": groq_api_key,
                             "base_url": "https://api.groq.com/openai/v1"
                         }],
-                        "cache_seed": 42
+                        # Responses are cached by normalized prompt instead of autogen's exact-match seed cache
+                        "cache_seed": None
                     }
-                    st.session_state.agents = create_search_agents(llm_config)
+                    st.session_state.agents = get_search_agents(llm_config, st.session_state.session_id)
                 
-                progress_bar = st.progress(0, text="🚀 Launching AI agents...")
-                status_text = st.empty()
+                # The search runs in the background job queue; identical in-flight queries share one job
+                current_date = datetime.now().strftime('%Y-%m-%d')
+                job_key = result_cache_key(search_query, current_date)
 
+                # A new search replaces the one still pending, unless it is the same query
+                previous = st.session_state.pending_search
+                if previous and previous['key'] != job_key:
+                    job_queue.cancel(previous['job_id'], st.session_state.session_id)
+                    st.session_state.pending_search = None
                 try:
-                    progress_bar.progress(25, text="🔍 Gathering intelligence...")
-                    st.session_state.search_results = run_search(
-                        st.session_state.agents,
-                        search_query,
-                        current_date=datetime.now().strftime('%Y-%m-%d')
-                    )
-                    
-                    progress_bar.progress(60, text="📊 Crafting visualizations...")
-                    st.session_state.visualization_data = create_visualization(
+                    job = job_queue.submit(
+                        st.session_state.session_id,
+                        job_key,
+                        search_job,
                         search_query,
-                        st.session_state.search_results
-                    )
-                    
-                    progress_bar.progress(80, text="📝 Generating final report...")
-                    st.session_state.report = generate_report(
-                        st.session_state.agents,
-                        st.session_state.search_results
+                        current_date,
+                        agents=st.session_state.agents,
+                        session_id=st.session_state.session_id
                     )
-                    
-                    progress_bar.progress(100, text="✅ Mission accomplished!")
-                    st.session_state.search_completed = True
-                    st.balloons()
-                except Exception as e:
-                    st.error(f"⚠️ Critical error: {str(e)}")
-                    progress_bar.empty()
+                    st.session_state.pending_search = {
+                        'job_id': job.id, 'key': job_key, 'query': search_query, 'model': model_name
+                    }
+                except TooManyJobs as e:
+                    st.error(f"⏳ {str(e)}, please wait for one to finish.")
+
+        if st.session_state.pending_search:
+            job_progress()
+
+        # Outcome of the last background search, shown once
+        notice = st.session_state.job_notice
+        st.session_state.job_notice = None
+        if notice is not None:
+            kind, message = notice
+            if kind == 'success':
+                st.balloons()
+            elif kind == 'error':
+                st.error(message)
+            else:
+                st.warning(message)
 
 # Results display
-if st.session_state.search_completed:
-    with st.container():
+active = st.session_state.results_store.get(st.session_state.active_search) if st.session_state.active_search else None
+if active is not None:
+    # Right after a search the report and reviewer feedback stream in; reruns reuse the stored text
+    report, review = active.report, active.review
+    report_trace = nullcontext()
+    if report is None:
+        report = TextStream(stream_report(st.session_state.agents, active.search_results))
+        review = TextStream(stream_review(st.session_state.agents, report))
+        # The streams start while the dashboard renders, so their spans join this session's trace
+        report_trace = tracing.span("insights", query=active.query, session_id=st.session_state.session_id)
+
+    with report_trace, st.container():
         st.markdown("""
             <div class='data-card'>
                 <h3 style='margin-bottom: 1rem; color: #6366f1'>📈 Insights Dashboard</h3>
                 {}
             </div>
-        """.format(display_results(st.session_state.search_results, st.session_state.report, st.session_state.visualization_data)), unsafe_allow_html=True)
+        """.format(display_results(active, report, review)), unsafe_allow_html=True)
+
+    if isinstance(report, TextStream):
+        active.report = report.text
+        active.review = review.text
 
     # Export controls
-    col1, col2 = st.columns(2)
-    with col1:
-        st.download_button(
-            label="📄 Export Report (MD)",
-            data=st.session_state.report,
-            file_name=f"report_{search_query.replace(' ', '_')}.md",
-            mime="text/markdown",
-            use_container_width=True
-        )
-    with col2:
-        st.download_button(
-            label="📊 Export Data (JSON)",
-            data=json.dumps(st.session_state.search_results),
-            file_name=f"data_{search_query.replace(' ', '_')}.json",
-            mime="application/json",
-            use_container_width=True
-        )
+    export_controls(active)
 
 # Feature highlights
 st.markdown("---")
@@ -279,11 +374,36 @@ with st.sidebar:
     """, unsafe_allow_html=True)
     
     st.markdown("### 🔍 Search History")
-    # Add search history component here
+    history = st.session_state.results_store.history()
+    if not history:
+        st.caption("No searches yet.")
+    for past in history:
+        st.button(
+            f"{past.query} · {datetime.fromtimestamp(past.created).strftime('%H:%M')}",
+            key=f"history_{past.id}",
+            on_click=select_search,
+            args=(past.id,),
+            type="primary" if past.id == st.session_state.active_search else "secondary",
+            use_container_width=True
+        )
     
     st.markdown("### 🏆 Leaderboard")
     # Add user statistics component here
     
+    cache_stats = result_cache.stats()
+    st.caption(f"⚡ Result cache: {cache_stats['hits']} hits · {cache_stats['misses']} misses")
+    llm_stats = llm_response_cache.stats()
+    st.caption(f"🧠 LLM cache: {llm_stats['hits'] + llm_stats['near_hits']} hits · {llm_stats['misses']} misses")
+    search_flights = search_flight.stats()
+    report_flights = [flight.stats() for flight in (report_flight, report_stream_flight, review_stream_flight)]
+    st.caption(f"🪢 Shared calls: {search_flights['collapsed']} searches · {sum(f['collapsed'] for f in report_flights)} reports")
+    job_stats = job_queue.stats()
+    st.caption(f"🧵 Search jobs: {job_stats['running']} running · {job_stats['queued']} queued · {job_stats['coalesced']} shared")
+    
+    trace_panel = tracing.get_exporter(tracing.MemoryExporter)
+    if trace_panel is not None:
+        display_diagnostics(trace_panel, st.session_state.session_id)
+    
     st.markdown("---")
     st.markdown("""
         <div style='text-align: center; color: #94a3b8; font-size: 0.85rem;'>
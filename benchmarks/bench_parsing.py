@@ -0,0 +1,60 @@
+"""
+CPU cost of parsing the saved Google and Google News fixture pages with each parser backend.
+
+Run from the repository root:
+    python -m benchmarks.bench_parsing [--iterations 30]
+"""
+import argparse
+import os
+import statistics
+import time
+
+import parsing
+from search_engine import parse_google_results, parse_news_results
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+PAGES = [
+    ('Google Search', 'google_search.html', parse_google_results, 10),
+    ('News', 'google_news.html', parse_news_results, 5),
+]
+
+def available_parsers():
+    """Return the parser backends installed in this environment"""
+    parsers = ['html.parser']
+    if parsing.DEFAULT_PARSER == 'lxml':
+        parsers.append('lxml')
+    return parsers
+
+def measure(parse_fn, html, num_results, parser, targeted, iterations):
+    """Return the median CPU milliseconds per parse and the number of results extracted"""
+    samples = []
+    results = []
+    for _ in range(iterations):
+        start = time.process_time()
+        results = parse_fn(html, num_results=num_results, parser=parser, targeted=targeted)
+        samples.append((time.process_time() - start) * 1000)
+    return statistics.median(samples), len(results)
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    arg_parser.add_argument('--iterations', type=int, default=30)
+    args = arg_parser.parse_args()
+
+    print(f"{'page':<15} {'parser':<12} {'mode':<9} {'cpu ms':>8} {'saved':>8} {'results':>8}")
+    for name, filename, parse_fn, num_results in PAGES:
+        with open(os.path.join(FIXTURES_DIR, filename), encoding='utf-8') as f:
+            html = f.read()
+
+        baseline = None
+        for parser in available_parsers():
+            for targeted in (False, True):
+                cpu_ms, count = measure(parse_fn, html, num_results, parser, targeted, args.iterations)
+                if baseline is None:
+                    baseline = cpu_ms
+                mode = 'targeted' if targeted else 'full'
+                saved = f"{(1 - cpu_ms / baseline) * 100:.0f}%"
+                print(f"{name:<15} {parser:<12} {mode:<9} {cpu_ms:>8.2f} {saved:>8} {count:>8}")
+
+if __name__ == '__main__':
+    main()
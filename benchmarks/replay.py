@@ -0,0 +1,104 @@
+"""
+Offline replay of recorded Google, Google News and Wikipedia API responses,
+plus a sample article page for the content enrichment stage.
+
+replay_fixtures() swaps the shared transport session for one whose adapter answers
+every request from benchmarks/fixtures, so the whole search pipeline runs without
+network access.
+"""
+import os
+import time
+from fnmatch import fnmatch
+from contextlib import contextmanager, ExitStack
+from unittest import mock
+from urllib.parse import urlsplit, parse_qs
+
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+import transport
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# (host, path, required query parameter, fixture file, content type); host and path may be wildcards
+ROUTES = [
+    ('www.google.com', '/search', None, 'google_search.html', 'text/html; charset=UTF-8'),
+    ('news.google.com', '/search', None, 'google_news.html', 'text/html; charset=utf-8'),
+    ('en.wikipedia.org', '/w/api.php', ('action', 'opensearch'), 'wikipedia_opensearch.json', 'application/json; charset=utf-8'),
+    ('en.wikipedia.org', '/w/api.php', ('action', 'query'), 'wikipedia_extracts.json', 'application/json; charset=utf-8'),
+    ('en.wikipedia.org', '/wiki/*', None, 'article.html', 'text/html; charset=utf-8'),
+    ('www.example-*.com', '/*', None, 'article.html', 'text/html; charset=utf-8'),
+]
+
+class FixtureAdapter(BaseAdapter):
+    """Transport adapter that serves recorded fixture files instead of touching the network"""
+
+    def __init__(self, latency=0.0):
+        super().__init__()
+        self.latency = latency
+        self.requests_served = 0
+        self._bodies = {}
+
+    def _load(self, filename):
+        if filename not in self._bodies:
+            with open(os.path.join(FIXTURES_DIR, filename), 'rb') as f:
+                self._bodies[filename] = f.read()
+        return self._bodies[filename]
+
+    def _route(self, url):
+        parts = urlsplit(url)
+        params = parse_qs(parts.query)
+        for host, path, param, filename, content_type in ROUTES:
+            if not fnmatch(parts.hostname or '', host) or not fnmatch(parts.path, path):
+                continue
+            if param and params.get(param[0], [None])[0] != param[1]:
+                continue
+            return filename, content_type
+        return None, None
+
+    def send(self, request, **kwargs):
+        # Simulated network round trip, so concurrency shows up in wall-clock numbers
+        if self.latency:
+            time.sleep(self.latency)
+
+        filename, content_type = self._route(request.url)
+        response = requests.Response()
+        response.url = request.url
+        response.request = request
+        response.headers = CaseInsensitiveDict()
+        # The whole body is in memory, so streamed reads are served from it too
+        response._content_consumed = True
+        if filename is None:
+            response.status_code = 404
+            response._content = b''
+        else:
+            response.status_code = 200
+            response.headers['Content-Type'] = content_type
+            response._content = self._load(filename)
+            response.encoding = 'utf-8'
+        self.requests_served += 1
+        return response
+
+    def close(self):
+        pass
+
+@contextmanager
+def replay_fixtures(latency=0.0):
+    """Route every transport request to the fixture files for the duration of the block"""
+    adapter = FixtureAdapter(latency=latency)
+    session = requests.Session()
+    session.headers.update(transport.DEFAULT_HEADERS)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+    previous = transport.install_session(session)
+    try:
+        with ExitStack() as stack:
+            # Keep replays hermetic: no reads from or writes to the on-disk response cache
+            stack.enter_context(mock.patch.object(transport, 'HTTP_CACHE_DIR', ''))
+            stack.enter_context(mock.patch.object(transport, '_response_cache', None))
+            yield adapter
+    finally:
+        transport.install_session(previous)
+        session.close()
@@ -0,0 +1,187 @@
+"""
+End-to-end benchmark of the search pipeline against recorded fixtures.
+
+Runs search_web, run_search, create_visualization and generate_report offline,
+reports per-stage latency percentiles, throughput and memory allocations, and
+optionally saves or compares JSON baselines.
+
+Run from the repository root:
+    python -m benchmarks.run_benchmarks [--iterations 20] [--latency 0.05]
+    python -m benchmarks.run_benchmarks --save default
+    python -m benchmarks.run_benchmarks --compare default
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks.replay import replay_fixtures
+from enrichment import content_cache
+from report_generator import generate_report
+from search_engine import create_search_agents, result_cache, run_search, search_web
+from visualizations import create_visualization
+
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+QUERY = "stock price"
+SEARCH_DATE = "2025-04-18"
+
+# Agents are only constructed for generate_report; nothing here calls the endpoint
+OFFLINE_LLM_CONFIG = {
+    "config_list": [{
+        "model": "llama3-8b-8192",
+        "api_key": "offline-replay",
+        "base_url": "http://127.0.0.1:9/v1"
+    }],
+    "cache_seed": None
+}
+
+def percentile(samples, pct):
+    """Return the pct-th percentile of samples using linear interpolation"""
+    ordered = sorted(samples)
+    if len(ordered) == 1:
+        return ordered[0]
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+def build_stages(agents, package):
+    """Return the (stage name, callable) pairs to benchmark"""
+    def cold_run_search():
+        # Measure the full scrape and page extraction, not the caches
+        result_cache.invalidate()
+        content_cache.invalidate()
+        return run_search(agents, QUERY, SEARCH_DATE)
+
+    def visualization():
+        return create_visualization(QUERY, package)
+
+    return [
+        ('search_web', lambda: search_web(QUERY)),
+        ('run_search', cold_run_search),
+        ('create_visualization', visualization),
+        ('generate_report', lambda: generate_report(agents, package)),
+    ]
+
+def bench_stage(fn, iterations, warmup):
+    """Time fn and measure its allocations in a separate traced run"""
+    for _ in range(warmup):
+        fn()
+
+    samples = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    elapsed = time.perf_counter() - started
+
+    # Allocation tracing slows everything down, so it never overlaps the timed loop
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    fn()
+    after, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(samples, 50), 3),
+        'p90_ms': round(percentile(samples, 90), 3),
+        'p99_ms': round(percentile(samples, 99), 3),
+        'mean_ms': round(statistics.fmean(samples), 3),
+        'throughput_per_s': round(iterations / elapsed, 2),
+        'peak_alloc_kb': round((peak - before) / 1024, 1),
+        'retained_kb': round((after - before) / 1024, 1),
+    }
+
+def run(iterations, warmup, latency):
+    """Run every stage against the fixtures and return the results document"""
+    random.seed(0)
+    agents = create_search_agents(OFFLINE_LLM_CONFIG)
+
+    stages = {}
+    with replay_fixtures(latency=latency) as adapter:
+        result_cache.invalidate()
+        package = run_search(agents, QUERY, SEARCH_DATE)
+        for name, fn in build_stages(agents, package):
+            stages[name] = bench_stage(fn, iterations, warmup)
+        requests_served = adapter.requests_served
+    result_cache.invalidate()
+
+    return {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'query': QUERY,
+        'latency_s': latency,
+        'results_per_query': len(package['results']),
+        'requests_served': requests_served,
+        'stages': stages,
+    }
+
+def print_report(report):
+    """Print the per-stage table"""
+    print(f"{'stage':<22} {'p50 ms':>9} {'p90 ms':>9} {'p99 ms':>9} {'ops/s':>9} {'peak KB':>9} {'kept KB':>9}")
+    for name, stats in report['stages'].items():
+        print(f"{name:<22} {stats['p50_ms']:>9.2f} {stats['p90_ms']:>9.2f} {stats['p99_ms']:>9.2f} "
+              f"{stats['throughput_per_s']:>9.1f} {stats['peak_alloc_kb']:>9.1f} {stats['retained_kb']:>9.1f}")
+
+def compare(report, baseline, threshold):
+    """Print p50 and peak allocation changes against a baseline; return the regressed stages"""
+    regressions = []
+    print(f"\n{'stage':<22} {'p50 base':>9} {'p50 now':>9} {'change':>8} {'peak base':>10} {'peak now':>9}")
+    for name, stats in report['stages'].items():
+        base = baseline['stages'].get(name)
+        if base is None:
+            print(f"{name:<22} {'(new stage)':>9}")
+            continue
+        change = (stats['p50_ms'] - base['p50_ms']) / base['p50_ms'] * 100 if base['p50_ms'] else 0.0
+        flag = "  REGRESSION" if change > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<22} {base['p50_ms']:>9.2f} {stats['p50_ms']:>9.2f} {change:>+7.1f}% "
+              f"{base['peak_alloc_kb']:>10.1f} {stats['peak_alloc_kb']:>9.1f}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--warmup', type=int, default=2)
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help="simulated per-request network latency in seconds")
+    parser.add_argument('--save', metavar='NAME', help="store results as baselines/NAME.json")
+    parser.add_argument('--compare', metavar='NAME', help="compare against baselines/NAME.json")
+    parser.add_argument('--threshold', type=float, default=20.0,
+                        help="p50 slowdown in percent that counts as a regression")
+    parser.add_argument('--output', help="also write the results JSON to this path")
+    args = parser.parse_args()
+
+    report = run(args.iterations, args.warmup, args.latency)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.save:
+        os.makedirs(BASELINES_DIR, exist_ok=True)
+        path = os.path.join(BASELINES_DIR, f"{args.save}.json")
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {path}")
+
+    if args.compare:
+        with open(os.path.join(BASELINES_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        if compare(report, baseline, args.threshold):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,190 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with per-entry expiry and least-recently-used eviction.
+    Hit and miss counters are kept for diagnostics.
+    """
+
+    def __init__(self, maxsize=256, ttl=600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if it is missing or expired"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl=None):
+        """Store value under key, evicting the least recently used entries when full"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry when no key is given"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._entries)}
+
+    def __len__(self):
+        return len(self._entries)
+
+class SQLiteCache:
+    """
+    On-disk cache tier backed by SQLite so entries survive process restarts.
+    Values are stored as JSON; expiry uses wall-clock time and eviction is least-recently-used.
+    """
+
+    def __init__(self, path, maxsize=1024, ttl=600):
+        self.path = path
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection that commits on success and is always closed"""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if it is missing or expired"""
+        now = time.time()
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return default
+            if row[1] < now:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+                return default
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        """Store value under key, evicting the least recently used rows when full"""
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), expires_at, now)
+            )
+            conn.execute("DELETE FROM cache WHERE expires_at < ?", (now,))
+            conn.execute(
+                "DELETE FROM cache WHERE key IN ("
+                "SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.maxsize,)
+            )
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry when no key is given"""
+        with self._lock, self._connect() as conn:
+            if key is None:
+                conn.execute("DELETE FROM cache")
+            else:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+
+class TieredCache:
+    """
+    In-process TTL/LRU cache with an optional persistent tier behind it.
+    Disk hits are promoted into memory; hits and misses are counted across both tiers.
+    """
+
+    def __init__(self, maxsize=256, ttl=600, disk_path=None, disk_maxsize=1024):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.disk = SQLiteCache(disk_path, maxsize=disk_maxsize, ttl=ttl) if disk_path else None
+        self.hits = 0
+        self.misses = 0
+        # Guards the counters; lookups come from the search fan-out threads
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value for key from memory, then disk"""
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except sqlite3.Error as e:
+                print(f"Error reading cache: {str(e)}")
+                value = None
+            if value is not None:
+                self.memory.set(key, value)
+
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        """Store value in every configured tier"""
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error as e:
+                print(f"Error writing cache: {str(e)}")
+
+    def invalidate(self, key=None):
+        """Drop one entry, or every entry when no key is given, from every tier"""
+        self.memory.invalidate(key)
+        if self.disk is not None:
+            self.disk.invalidate(key)
+
+    def stats(self):
+        """Return hit/miss counters and the in-memory size"""
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        return {
+            'hits': hits,
+            'misses': misses,
+            'size': len(self.memory),
+            'persistent': self.disk is not None,
+        }
@@ -0,0 +1,122 @@
+import base64
+import re
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from ranking import strip_time_prefix
+from similarity import LSHIndex, MinHasher, jaccard, shingles
+
+# Query parameters that only track the click and never change the page
+TRACKING_PARAMS = frozenset(['gclid', 'fbclid', 'mc_cid', 'mc_eid', 'igshid', '_ga', 'ref_src'])
+
+# Results whose estimated title+snippet similarity reaches this are the same story
+NEAR_DUPLICATE_THRESHOLD = 0.7
+
+_NEWS_ARTICLE_PATH = re.compile(r"^/(?:rss/)?(?:articles|read)/([A-Za-z0-9_-]+)")
+_EMBEDDED_URL = re.compile(rb"https?://[\x21-\x7e]+")
+
+def _is_tracking_param(name):
+    name = name.lower()
+    return name.startswith('utm_') or name in TRACKING_PARAMS
+
+def _unwrap_google_redirect(parts):
+    # https://www.google.com/url?q=<target>&sa=... and the relative /url?q=... form
+    if parts.path == '/url' and (not parts.netloc or parts.netloc.endswith('google.com')):
+        params = dict(parse_qsl(parts.query))
+        target = params.get('q') or params.get('url')
+        if target and target.startswith(('http://', 'https://')):
+            return urlsplit(target)
+    return parts
+
+def _resolve_google_news(parts):
+    """
+    Older Google News article ids are base64-encoded protobufs that embed the publisher URL.
+    Newer ids need a round trip to Google to resolve, so those links are kept as they are.
+    """
+    if parts.netloc != 'news.google.com':
+        return parts
+    match = _NEWS_ARTICLE_PATH.match(parts.path)
+    if not match:
+        return parts
+    article_id = match.group(1)
+    try:
+        decoded = base64.urlsafe_b64decode(article_id + '=' * (-len(article_id) % 4))
+    except (ValueError, TypeError):
+        return parts
+    embedded = _EMBEDDED_URL.search(decoded)
+    if not embedded:
+        return parts
+    return urlsplit(embedded.group(0).decode('ascii', 'ignore'))
+
+def canonicalize_url(url):
+    """
+    Return the URL a result really points to: Google redirects and resolvable Google News
+    links are unwrapped, tracking parameters (utm_* and click ids) and fragments are dropped,
+    and the scheme and host are lowercased.
+    """
+    if not url:
+        return url
+    parts = _resolve_google_news(_unwrap_google_redirect(urlsplit(url.strip())))
+    query = urlencode([(name, value) for name, value in parse_qsl(parts.query, keep_blank_values=True)
+                       if not _is_tracking_param(name)])
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path, query, ''))
+
+def url_key(url):
+    """Comparison key for canonical URLs: ignores the scheme, a leading www. and a trailing slash"""
+    parts = urlsplit(url)
+    host = parts.netloc[4:] if parts.netloc.startswith('www.') else parts.netloc
+    path = parts.path.rstrip('/') or '/'
+    return f"{host}{path}?{parts.query}" if parts.query else f"{host}{path}"
+
+class Deduplicator:
+    """
+    Collapse search results incrementally as batches arrive.
+    A result is a duplicate when its canonical URL was already seen, or when its title and
+    snippet are near-identical to a kept result (MinHash with banded LSH candidates).
+    Duplicates are folded into the kept result, which records every source and link
+    it was seen under in 'sources' and 'duplicate_links'.
+    """
+
+    def __init__(self, threshold=NEAR_DUPLICATE_THRESHOLD, num_perm=64, bands=16):
+        self.threshold = threshold
+        self.kept = []
+        self.collapsed = 0
+        self._hasher = MinHasher(num_perm=num_perm)
+        self._index = LSHIndex(num_perm=num_perm, bands=bands)
+        self._by_url = {}
+        self._signatures = []
+
+    def _merge(self, kept, duplicate):
+        source = duplicate.get('source')
+        if source and source not in kept['sources']:
+            kept['sources'].append(source)
+        if duplicate['link'] != kept['link'] and duplicate['link'] not in kept['duplicate_links']:
+            kept['duplicate_links'].append(duplicate['link'])
+        self.collapsed += 1
+
+    def add(self, result):
+        """Return the canonicalized result if it is new, or None if it was folded into an earlier one"""
+        result = dict(result)
+        result['link'] = canonicalize_url(result.get('link', ''))
+
+        key = url_key(result['link']) if result['link'] else None
+        if key is not None and key in self._by_url:
+            self._merge(self.kept[self._by_url[key]], result)
+            return None
+
+        text = f"{result.get('title', '')} {strip_time_prefix(result.get('snippet', ''))}"
+        signature = self._hasher.signature(shingles(text))
+        for position in self._index.candidates(signature):
+            if jaccard(signature, self._signatures[position]) >= self.threshold:
+                self._merge(self.kept[position], result)
+                if key is not None:
+                    self._by_url[key] = position
+                return None
+
+        result['sources'] = [result['source']] if result.get('source') else []
+        result['duplicate_links'] = []
+        position = len(self.kept)
+        self.kept.append(result)
+        self._signatures.append(signature)
+        self._index.add(position, signature)
+        if key is not None:
+            self._by_url[key] = position
+        return result
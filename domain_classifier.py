@@ -0,0 +1,74 @@
+import re
+from collections import Counter
+from functools import lru_cache
+from text_analysis import get_corpus
+
+GENERAL = 'general'
+
+# Routing terms per domain, in order of precedence when scores tie. Terms match
+# case-insensitively at the start of a word, so 'tech' also matches 'technology';
+# terms of three letters or fewer ('ai', 'app') must match a whole word.
+DOMAIN_TERMS = {
+    'financial': ['stock', 'market', 'price', 'investment', 'financial', 'economy'],
+    'healthcare': ['health', 'covid', 'vaccine', 'medical', 'disease', 'treatment', 'hospital'],
+    'technology': ['tech', 'ai', 'software', 'digital', 'app', 'mobile phone', 'laptop',
+                   'coding', 'engineering', 'enginering', 'business intelligence', 'data science'],
+    'sports': ['sport'],
+    'entertainment': ['entertainment'],
+    'culture': ['art and culture'],
+    'news': ['trending news'],
+}
+
+# When the query matches no domain, the results decide if one domain clearly dominates them
+CORPUS_MIN_HITS = 5
+CORPUS_MIN_SHARE = 0.5
+
+def _term_pattern(term):
+    # Words of a phrase may be separated by spaces or hyphens ('data-science')
+    pattern = r'[\s\-]+'.join(re.escape(word) for word in term.split())
+    return pattern + r'\b' if len(term) <= 3 else pattern
+
+def _build_matcher():
+    groups = []
+    for domain, terms in DOMAIN_TERMS.items():
+        alternation = "|".join(_term_pattern(term) for term in sorted(terms, key=len, reverse=True))
+        groups.append(f"(?P<{domain}>{alternation})")
+    return re.compile(r"\b(?:" + "|".join(groups) + ")", re.IGNORECASE)
+
+_MATCHER = _build_matcher()
+
+def score_text(text):
+    """Count routing-term matches per domain in a single pass over text"""
+    return Counter(match.lastgroup for match in _MATCHER.finditer(text))
+
+def _best_domain(scores):
+    best = None
+    for domain in DOMAIN_TERMS:
+        if scores[domain] and (best is None or scores[domain] > scores[best]):
+            best = domain
+    return best
+
+@lru_cache(maxsize=256)
+def classify_query(query):
+    """Return the domain the query's own terms point to, or None"""
+    return _best_domain(score_text(query))
+
+@lru_cache(maxsize=32)
+def _classify_corpus(corpus):
+    scores = score_text(corpus.text)
+    best = _best_domain(scores)
+    if best is None or scores[best] < CORPUS_MIN_HITS or scores[best] < CORPUS_MIN_SHARE * sum(scores.values()):
+        return None
+    return best
+
+def classify(query, results=None):
+    """
+    Return the domain for a query: 'financial', 'healthcare', 'technology', 'sports',
+    'entertainment', 'culture', 'news' or 'general'.
+    The query decides when it contains routing terms; otherwise the results are scored.
+    Both steps are memoized, so the report and the visualization share one decision.
+    """
+    domain = classify_query(query.strip().lower())
+    if domain is None and results:
+        domain = _classify_corpus(get_corpus(results))
+    return domain or GENERAL
@@ -0,0 +1,148 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+import transport
+import tracing
+from cache import TieredCache
+
+# How many of the top-ranked results get their full page text
+ENRICH_TOP_K = 5
+
+# Enrichment is optional and off unless SEARCH_ENRICH=1; it can add up to ENRICH_DEADLINE per query
+ENRICH_CONTENT = os.environ.get("SEARCH_ENRICH", "0") == "1"
+
+# Per-page limits: pages larger or slower than this are skipped
+PAGE_MAX_BYTES = 2 * 1024 * 1024
+PAGE_TIMEOUT = 6
+
+# Wall-clock budget for the whole stage; unfinished pages keep just their snippet
+ENRICH_DEADLINE = 10
+
+# Extracted text kept per page
+CONTENT_MAX_CHARS = 6000
+
+EXTRACT_WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+# Extracted text by URL, optionally persisted to CONTENT_CACHE_PATH
+content_cache = TieredCache(
+    maxsize=512,
+    ttl=24 * 60 * 60,
+    disk_path=os.environ.get("CONTENT_CACHE_PATH"),
+)
+
+_download_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="enrich")
+_extract_pool = None
+_extract_pool_lock = threading.Lock()
+
+def _get_extract_pool():
+    # Started on first use; spawn avoids forking a process that already runs threads
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is None:
+            _extract_pool = ProcessPoolExecutor(
+                max_workers=EXTRACT_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        return _extract_pool
+
+def shutdown_extract_pool():
+    """Stop the extraction worker processes; the next enrichment starts new ones"""
+    global _extract_pool
+    with _extract_pool_lock:
+        if _extract_pool is not None:
+            _extract_pool.shutdown(wait=False, cancel_futures=True)
+            _extract_pool = None
+
+def download_page(url):
+    """
+    Download an HTML page as raw bytes, giving up on non-HTML bodies and bodies over PAGE_MAX_BYTES.
+    Decoding is left to the extractor, which reads the page's own charset declaration.
+    """
+    with tracing.span("fetch", source="page") as fetch_span:
+        response = transport.get(url, timeout=PAGE_TIMEOUT, stream=True)
+        try:
+            fetch_span.set(status=response.status_code)
+            response.raise_for_status()
+            if 'html' not in response.headers.get('Content-Type', 'text/html'):
+                return None
+            if int(response.headers.get('Content-Length') or 0) > PAGE_MAX_BYTES:
+                return None
+
+            body = bytearray()
+            started = time.monotonic()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                body.extend(chunk)
+                if len(body) > PAGE_MAX_BYTES or time.monotonic() - started > PAGE_TIMEOUT:
+                    return None
+            fetch_span.add_bytes(len(body))
+            return bytes(body)
+        finally:
+            response.close()
+
+def extract_text(html, url):
+    """
+    Extract the main article text from a page's raw bytes; runs in the extraction worker processes.
+    trafilatura detects the encoding itself, so pages served without a charset aren't misread as Latin-1.
+    """
+    import trafilatura
+    text = trafilatura.extract(html, url=url, include_comments=False, include_tables=False, favor_precision=True)
+    return text[:CONTENT_MAX_CHARS] if text else None
+
+def enrich_results(results, top_k=ENRICH_TOP_K, deadline=ENRICH_DEADLINE):
+    """
+    Add the main text of the top_k results' pages as result['content'].
+    Pages are downloaded concurrently and their text extracted in worker processes;
+    text is cached by URL. Results that fail or miss the deadline are left unchanged.
+    """
+    targets = [r for r in results[:top_k] if r.get('link', '').startswith(('http://', 'https://'))]
+    with tracing.span("enrich", pages=len(targets)) as enrich_span:
+        pending = {}
+        cached = 0
+        for result in targets:
+            text = content_cache.get(result['link'])
+            if text:
+                result['content'] = text
+                cached += 1
+            else:
+                future = _download_executor.submit(tracing.propagate(download_page), result['link'])
+                pending[future] = ('download', result)
+
+        # Hand each page to the extraction pool as soon as its download finishes
+        extracted = 0
+        stop_at = time.monotonic() + deadline
+        while pending:
+            done, _ = wait(pending, timeout=max(stop_at - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                stage, result = pending.pop(future)
+                try:
+                    value = future.result()
+                except BrokenProcessPool as e:
+                    # A crashed worker breaks the whole pool; start a fresh one next time
+                    print(f"Error extracting content: {str(e)}")
+                    shutdown_extract_pool()
+                    continue
+                except Exception as e:
+                    print(f"Error enriching {result['link']}: {str(e)}")
+                    continue
+                if not value:
+                    continue
+                if stage == 'download':
+                    try:
+                        pending[_get_extract_pool().submit(extract_text, value, result['link'])] = ('extract', result)
+                    except BrokenProcessPool as e:
+                        print(f"Error starting content extraction: {str(e)}")
+                        shutdown_extract_pool()
+                else:
+                    result['content'] = value
+                    content_cache.set(result['link'], value)
+                    extracted += 1
+
+        for future in pending:
+            future.cancel()
+        enrich_span.set(cached=cached, extracted=extracted, unfinished=len(pending))
+    return results
@@ -0,0 +1,236 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+import tracing
+from search_engine import run_search
+from visualizations import create_visualization
+
+# Jobs running at once across all sessions; the rest wait in the queue
+JOB_WORKERS = int(os.environ.get("SEARCH_JOB_WORKERS", "4"))
+
+# Queued plus running jobs one session may hold at a time
+MAX_JOBS_PER_USER = 2
+
+# Finished jobs are kept this long so their sessions can collect the result
+JOB_RETENTION = 10 * 60
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = 'queued', 'running', 'done', 'failed', 'cancelled'
+
+class JobCancelled(Exception):
+    """Raised inside a running job once every session that asked for it has cancelled"""
+
+class TooManyJobs(Exception):
+    """Raised when a session already has MAX_JOBS_PER_USER jobs in flight"""
+
+class Job:
+    """A unit of background work with stage progress, shared by every session that asked for it"""
+
+    def __init__(self, key, fn, args, kwargs):
+        self.id = uuid.uuid4().hex[:12]
+        self.key = key
+        self.owners = set()
+        self.status = QUEUED
+        self.progress = 0
+        self.stage = "⏳ Waiting for a free worker..."
+        self.batches = []
+        self.result = None
+        self.error = None
+        self.finished = None
+        self._fn = fn
+        self._args = args
+        self._kwargs = kwargs
+        self._cancelled = threading.Event()
+        self._done = threading.Event()
+
+    @property
+    def done(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    def checkpoint(self):
+        """Stop the job here if it has been cancelled"""
+        if self._cancelled.is_set():
+            raise JobCancelled()
+
+    def report(self, progress, stage):
+        """Publish the current stage and percentage for polling sessions, stopping here if cancelled"""
+        self.checkpoint()
+        self.update(progress, stage)
+
+    def update(self, progress, stage):
+        """Publish the current stage and percentage without a cancellation checkpoint"""
+        self.progress = progress
+        self.stage = stage
+
+    def add_batch(self, source, results):
+        """Publish partial results so sessions can show them before the job finishes"""
+        self.batches.append((source, results))
+
+    def wait(self, timeout=None):
+        """Block until the job finishes; returns False on timeout"""
+        return self._done.wait(timeout)
+
+class JobQueue:
+    """
+    Bounded worker pool that runs jobs fairly across sessions.
+    Each session has its own FIFO queue and workers take jobs round-robin across sessions,
+    so one session's burst can't starve the others. Submitting a key that is already queued
+    or running joins the existing job instead of starting another.
+    """
+
+    def __init__(self, workers=JOB_WORKERS, per_user=MAX_JOBS_PER_USER):
+        self.workers = workers
+        self.per_user = per_user
+        self.coalesced = 0
+        self._jobs = {}
+        self._inflight = {}
+        self._queues = OrderedDict()
+        self._threads = []
+        self._cond = threading.Condition()
+
+    def _start_workers(self):
+        # Started on first use, like the other executors
+        while len(self._threads) < self.workers:
+            thread = threading.Thread(target=self._work, name=f"job-{len(self._threads)}", daemon=True)
+            self._threads.append(thread)
+            thread.start()
+
+    def submit(self, user_id, key, fn, *args, **kwargs):
+        """
+        Queue fn(job, *args, **kwargs) for user_id and return its Job.
+        If a job with the same key is in flight, user_id joins it instead.
+        """
+        with self._cond:
+            self._expire()
+            job = self._inflight.get(key)
+            if job is not None:
+                job.owners.add(user_id)
+                self.coalesced += 1
+                return job
+
+            active = sum(1 for queued in self._inflight.values() if user_id in queued.owners)
+            if active >= self.per_user:
+                raise TooManyJobs(f"{active} searches are already in progress for this session")
+
+            job = Job(key, fn, args, kwargs)
+            job.owners.add(user_id)
+            self._jobs[job.id] = job
+            self._inflight[key] = job
+            self._queues.setdefault(user_id, deque()).append(job)
+            self._start_workers()
+            self._cond.notify()
+            return job
+
+    def get(self, job_id):
+        """Return the job with this ID, or None once it has expired"""
+        with self._cond:
+            self._expire()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id, user_id):
+        """
+        Withdraw user_id from a job. The job itself is only cancelled once no session
+        is waiting for it; a running job stops at its next checkpoint.
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.done:
+                return False
+            job.owners.discard(user_id)
+            if job.owners:
+                return True
+
+            job._cancelled.set()
+            # New submits of the same key start afresh instead of joining a job that is stopping
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            if job.status == QUEUED:
+                self._finish(job, CANCELLED)
+            return True
+
+    def stats(self):
+        """Return the number of queued and running jobs and of coalesced submits"""
+        with self._cond:
+            jobs = list(self._inflight.values())
+            return {
+                'queued': sum(1 for job in jobs if job.status == QUEUED),
+                'running': sum(1 for job in jobs if job.status == RUNNING),
+                'coalesced': self.coalesced,
+            }
+
+    def _next_job(self):
+        # Take the head of the first session's queue, then move that session to the back
+        while self._queues:
+            user_id, queue = next(iter(self._queues.items()))
+            del self._queues[user_id]
+            job = queue.popleft() if queue else None
+            if queue:
+                self._queues[user_id] = queue
+            if job is not None and job.status == QUEUED:
+                return job
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                job = self._next_job()
+                while job is None:
+                    self._cond.wait()
+                    job = self._next_job()
+                job.status = RUNNING
+            self._run(job)
+
+    def _run(self, job):
+        status = DONE
+        try:
+            job.checkpoint()
+            job.result = job._fn(job, *job._args, **job._kwargs)
+        except JobCancelled:
+            status = CANCELLED
+        except Exception as e:
+            print(f"Error running job {job.id}: {str(e)}")
+            job.error = str(e)
+            status = FAILED
+        with self._cond:
+            if self._inflight.get(job.key) is job:
+                del self._inflight[job.key]
+            self._finish(job, status)
+
+    def _finish(self, job, status):
+        job.status = status
+        if status == DONE:
+            job.progress = 100
+        job.finished = time.monotonic()
+        job._done.set()
+
+    def _expire(self):
+        cutoff = time.monotonic() - JOB_RETENTION
+        for job_id in [job_id for job_id, job in self._jobs.items() if job.finished and job.finished < cutoff]:
+            del self._jobs[job_id]
+
+# Shared by every session of the app
+job_queue = JobQueue()
+
+def search_job(job, query, current_date, agents=None, session_id=None):
+    """
+    Run the search and chart stages of a query as a background job.
+    The trace is tagged with the submitting session so its diagnostics panel can find it.
+    """
+    with tracing.span("query", query=query, session_id=session_id):
+        job.report(25, "🔍 Gathering intelligence...")
+        sources_done = []
+
+        # run_search may be shared with other jobs, so this job's cancellation must not
+        # escape into it; it is only checked once the search returns
+        def on_batch(source, results):
+            sources_done.append(source)
+            job.add_batch(source, results)
+            job.update(25 + 35 * len(sources_done) // 3, f"🔍 Gathering intelligence... {source} answered")
+
+        search_results = run_search(agents, query, current_date=current_date, on_batch=on_batch)
+        job.checkpoint()
+
+        job.report(60, "📊 Crafting visualizations...")
+        visualization_data = create_visualization(query, search_results)
+    return search_results, visualization_data
@@ -0,0 +1,158 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from similarity import LSHIndex, MinHasher, jaccard, shingles
+
+# The prompt's date header, which changes between otherwise identical requests. Only the
+# header is dropped: dates inside result snippets are part of what the answer is based on
+_DATE_HEADER = re.compile(r"^[ \t]*(?:- Date: |Today is )[^\n]*", re.MULTILINE)
+
+# One search result as formatted by generate_report
+_RESULT_BLOCK = re.compile(r"Result \d+:\s*\n(Title:.*?)\n---", re.DOTALL)
+_WHITESPACE = re.compile(r"\s+")
+
+def normalize_prompt(text):
+    """
+    Reduce a prompt to the parts that determine the answer:
+    drop the date header, sort formatted search results so their order
+    and numbering don't matter, and collapse whitespace.
+    """
+    blocks = _RESULT_BLOCK.findall(text)
+    if blocks:
+        text = _RESULT_BLOCK.sub("", text) + "\n" + "\n".join(sorted(b.strip() for b in blocks))
+    text = _DATE_HEADER.sub("", text, count=1)
+    return _WHITESPACE.sub(" ", text).strip()
+
+def _message_text(message):
+    content = message.get("content")
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+    return f"{message.get('role', '')}: {normalize_prompt(content or '')}"
+
+def split_request(key):
+    """
+    Split an LLM request into the parameters that must match exactly (model, sampling
+    settings, tools) and the normalized conversation text.
+    """
+    if isinstance(key, str):
+        try:
+            key = json.loads(key)
+        except ValueError:
+            return "", normalize_prompt(key)
+    params = {k: v for k, v in key.items() if k != "messages"}
+    text = "\n".join(_message_text(m) for m in key.get("messages", []))
+    return json.dumps(params, sort_keys=True, default=str), text
+
+class SemanticLLMCache:
+    """
+    LLM response cache keyed on normalized prompts rather than exact bytes.
+    Implements autogen's cache protocol (get/set/close and context manager), so it can be
+    passed as `cache=` to chats. In near-duplicate mode a miss falls back to the most similar
+    cached prompt with the same parameters when their MinHash similarity reaches `threshold`.
+    """
+
+    def __init__(self, maxsize=512, ttl=6 * 60 * 60, near_duplicate=False, threshold=0.9, num_perm=64):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.near_duplicate = near_duplicate
+        self.threshold = threshold
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._hasher = MinHasher(num_perm=num_perm)
+        self._index = LSHIndex(num_perm=num_perm)
+
+    def _fingerprint(self, key):
+        params, text = split_request(key)
+        digest = hashlib.sha256(f"{params}\n{text}".encode("utf-8")).hexdigest()
+        return digest, params, text
+
+    def _drop(self, digest):
+        entry = self._entries.pop(digest, None)
+        if entry is not None and entry['signature'] is not None:
+            self._index.remove(digest, entry['signature'])
+
+    def _live(self, digest, now):
+        entry = self._entries.get(digest)
+        if entry is not None and entry['expires_at'] < now:
+            self._drop(digest)
+            return None
+        return entry
+
+    def get(self, key, default=None):
+        """Return the cached response for an equivalent (or near-identical) request"""
+        digest, params, text = self._fingerprint(key)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live(digest, now)
+            if entry is not None:
+                self._entries.move_to_end(digest)
+                self.hits += 1
+                return entry['value']
+
+            if self.near_duplicate:
+                signature = self._hasher.signature(shingles(text))
+                best, best_score = None, self.threshold
+                for candidate in self._index.candidates(signature):
+                    other = self._live(candidate, now)
+                    if other is None or other['params'] != params:
+                        continue
+                    score = jaccard(signature, other['signature'])
+                    if score >= best_score:
+                        best, best_score = candidate, score
+                if best is not None:
+                    self._entries.move_to_end(best)
+                    self.near_hits += 1
+                    return self._entries[best]['value']
+
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        """Store a response, evicting the least recently used entries when full"""
+        digest, params, text = self._fingerprint(key)
+        signature = self._hasher.signature(shingles(text)) if self.near_duplicate else None
+        with self._lock:
+            self._drop(digest)
+            self._entries[digest] = {
+                'value': value,
+                'params': params,
+                'signature': signature,
+                'expires_at': time.monotonic() + self.ttl,
+            }
+            if signature is not None:
+                self._index.add(digest, signature)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+
+    def invalidate(self):
+        """Drop every cached response"""
+        with self._lock:
+            for digest in list(self._entries):
+                self._drop(digest)
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'near_hits': self.near_hits,
+                'misses': self.misses,
+                'size': len(self._entries),
+            }
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return None
@@ -0,0 +1,36 @@
+import os
+from bs4 import BeautifulSoup, SoupStrainer
+
+# Prefer the C-accelerated lxml parser when it is installed
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = 'lxml'
+except ImportError:
+    DEFAULT_PARSER = 'html.parser'
+
+# Allow overriding the backend, e.g. SEARCH_HTML_PARSER=html.parser for comparisons
+HTML_PARSER = os.environ.get("SEARCH_HTML_PARSER", DEFAULT_PARSER)
+
+def has_class(name):
+    """
+    Build a strainer filter matching elements that carry the given CSS class.
+    While parsing, the class attribute is still the raw string, so split it into tokens.
+    """
+    def match(value):
+        if value is None:
+            return False
+        classes = value.split() if isinstance(value, str) else value
+        return name in classes
+    return match
+
+# Targeted-parse filters: only these subtrees are materialized into the soup
+GOOGLE_RESULTS = SoupStrainer('div', class_=has_class('g'))
+NEWS_ARTICLES = SoupStrainer('article')
+
+def parse_html(html, only=None, parser=None):
+    """
+    Parse an HTML page with the configured backend.
+    When a SoupStrainer is passed as `only`, every element outside the matching
+    subtrees is skipped instead of being built into the tree.
+    """
+    return BeautifulSoup(html, parser or HTML_PARSER, parse_only=only)
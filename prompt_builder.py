@@ -0,0 +1,163 @@
+import re
+
+# tiktoken gives exact counts for OpenAI-style tokenizers; otherwise estimate from characters
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except Exception:
+    _encoding = None
+
+# Context window per model, in tokens
+MODEL_CONTEXT = {
+    "llama3-8b-8192": 8192,
+    "llama3-70b-8192": 8192,
+    "mixtral-8x7b-32768": 32768,
+    "claude-3-haiku-20240307": 200000,
+}
+DEFAULT_CONTEXT = 8192
+
+# Tokens kept free for the writer's answer
+OUTPUT_RESERVE = 2048
+
+# Prompts above this size only cost more without improving the report
+MAX_PROMPT_TOKENS = 12000
+
+# Extracted page text included per result, when the budget allows
+CONTENT_PROMPT_CHARS = 1500
+
+# Instruction blocks of the analysis prompt, keyed by their heading, and the query
+# terms that make them relevant. Blocks mapped to None, or not listed, are always included.
+# Terms match as word prefixes, except short ones, which must be a whole word or its plural.
+INSTRUCTION_BLOCKS = {
+    "Key Requirements": None,
+    "General Guidelines": None,
+    "Financial Analysis": ['stock', 'market', 'price', 'investment', 'financ', 'econom', 'trading', 'crypto', 'bank', 'banking'],
+    "Healthcare & Technology Analysis": ['health', 'covid', 'vaccine', 'medical', 'disease', 'treatment', 'hospital',
+                                         'tech', 'technolog', 'ai', 'software', 'digital', 'app', 'mobile', 'laptop', 'coding', 'data'],
+    "Marketing & Business Analysis": ['marketing', 'business', 'brand', 'customer', 'advertis', 'sales', 'startup', 'company'],
+    "Art and Culture": ['art', 'culture', 'ancient', 'histor', 'museum', 'heritage'],
+    "Entertainment": ['entertainment', 'movie', 'film', 'music', 'celebrit', 'box office', 'gaming', 'series'],
+    "Sports": ['sport', 'match', 'cricket', 'football', 'soccer', 'tennis', 'nba', 'league', 'tournament', 'player'],
+    "Top News Live": ['news', 'breaking', 'headline', 'trending', 'live', 'politic', 'election'],
+}
+
+_BLOCK_MARKER = "🔹"
+_HEADING_SUFFIX = re.compile(r"\s*\(if applicable\)\s*$", re.IGNORECASE)
+
+# Terms up to this length ('ai', 'art', 'live') would otherwise match 'air', 'article', 'liver'
+SHORT_TERM_CHARS = 4
+
+def count_tokens(text):
+    """Count prompt tokens, falling back to roughly four characters per token"""
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+def token_budget(model):
+    """Return the number of prompt tokens available for the given model"""
+    context = MODEL_CONTEXT.get(model, DEFAULT_CONTEXT)
+    return min(context - OUTPUT_RESERVE, MAX_PROMPT_TOKENS)
+
+def split_instruction_blocks(analysis_prompt):
+    """Split the analysis prompt into its preamble and a list of (heading, text) blocks"""
+    parts = analysis_prompt.split(_BLOCK_MARKER)
+    blocks = []
+    for part in parts[1:]:
+        lines = part.strip().splitlines()
+        heading = _HEADING_SUFFIX.sub("", lines[0].strip().rstrip(':')) if lines else ""
+        blocks.append((heading, _BLOCK_MARKER + part.rstrip()))
+    return parts[0].strip(), blocks
+
+def _term_pattern(term):
+    if len(term) <= SHORT_TERM_CHARS:
+        return r"\b" + re.escape(term) + r"s?\b"
+    return r"\b" + re.escape(term)
+
+def _matches(query_lower, terms):
+    return any(re.search(_term_pattern(term), query_lower) for term in terms)
+
+def select_instruction_blocks(analysis_prompt, query):
+    """Keep the always-on instruction blocks plus the ones relevant to the query's domain"""
+    preamble, blocks = split_instruction_blocks(analysis_prompt)
+    query_lower = query.lower()
+    selected = []
+    for heading, text in blocks:
+        terms = INSTRUCTION_BLOCKS.get(heading)
+        if terms is None or _matches(query_lower, terms):
+            selected.append((heading, text))
+    return preamble, selected
+
+def format_result(index, result, snippet_chars=None, content_chars=0):
+    """Format one search result the way the writer prompt lists them, with up to content_chars of page text"""
+    snippet = result.get('snippet', 'No snippet')
+    if snippet_chars is not None and len(snippet) > snippet_chars:
+        snippet = snippet[:snippet_chars].rstrip() + "..."
+    content = result.get('content', '')[:content_chars]
+    content_line = f"Content: {content.strip()}\n" if content else ""
+    return f"""
+Result {index}:
+Title: {result.get('title', 'No title')}
+Link: {result.get('link', '#')}
+Snippet: {snippet}
+{content_line}---
+"""
+
+def build_writer_prompt(query, search_date, results, analysis_prompt, model=None, system_message=None):
+    """
+    Assemble the writer prompt within the model's token budget, less the tokens of the
+    writer's system message, which is sent along with it.
+    Only instruction blocks relevant to the query are kept. Results arrive already ranked
+    by search_web_sources and are shortened or dropped from the end once the budget runs out.
+    Returns a dict with the prompt and its token accounting.
+    """
+    budget = token_budget(model)
+    if system_message:
+        budget -= count_tokens(system_message)
+    preamble, blocks = select_instruction_blocks(analysis_prompt, query)
+    instructions = "\n\n".join([preamble] + [text for _, text in blocks])
+
+    def render(formatted_results, used):
+        return f"""
+# REPORT GENERATION TASK
+
+## Search Information
+- Query: {query}
+- Date: {search_date}
+- Number of results: {used}
+
+## Search Results
+{formatted_results}
+
+## Report Instructions
+{instructions}
+
+Please generate a comprehensive, well-structured report based on the search results above.
+Organize the information in a clear, logical manner with proper headings, subheadings, and markdown formatting.
+Include relevant insights, analysis, and recommendations where appropriate.
+"""
+
+    # Results are added in rank order until the next one no longer fits, first
+    # trying it with its page text, then with the snippet only, then with a shortened snippet
+    tokens = count_tokens(render("", 0))
+    included = []
+    for result in results:
+        index = len(included) + 1
+        for snippet_chars, content_chars in ((None, CONTENT_PROMPT_CHARS), (None, 0), (120, 0)):
+            entry = format_result(index, result, snippet_chars, content_chars)
+            entry_tokens = count_tokens(entry)
+            if tokens + entry_tokens <= budget:
+                included.append(entry)
+                tokens += entry_tokens
+                break
+        else:
+            break
+
+    prompt = render("".join(included), len(included))
+    return {
+        'prompt': prompt,
+        'tokens': count_tokens(prompt),
+        'budget': budget,
+        'results_used': len(included),
+        'results_total': len(results),
+        'sections': [heading for heading, _ in blocks],
+    }
@@ -0,0 +1,113 @@
+import re
+from datetime import datetime, timedelta, timezone
+import numpy as np
+from text_analysis import STOPWORDS
+
+# BM25 term-frequency saturation and document-length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Title words count this many times over snippet words
+TITLE_WEIGHT = 2
+
+# Prior per source, multiplied into the final score
+SOURCE_WEIGHTS = {
+    'Google Search': 1.0,
+    'Wikipedia': 0.9,
+    'News': 1.0,
+}
+DEFAULT_SOURCE_WEIGHT = 0.8
+
+# Freshness adds up to this much to the normalized relevance, halving every FRESHNESS_HALF_LIFE hours
+FRESHNESS_WEIGHT = 0.3
+FRESHNESS_HALF_LIFE = 48
+
+_TOKEN_RE = re.compile(r"\w+")
+
+# search_news prefixes snippets with the article's <time> value: an ISO timestamp or "3 hours ago"
+_ISO_PREFIX = re.compile(r"^(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}(?::\d{2})?(?:\.\d+)?(?:Z|[+-]\d{2}:?\d{2})?) - ")
+_RELATIVE_PREFIX = re.compile(r"^(\d+)\s+(minute|hour|day|week)s?\s+ago - ", re.IGNORECASE)
+_RELATIVE_UNITS = {'minute': 1 / 60, 'hour': 1, 'day': 24, 'week': 24 * 7}
+
+def tokenize(text):
+    """Lowercase word tokens with stopwords removed"""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in STOPWORDS]
+
+def published_age_hours(snippet, now=None):
+    """Return the age in hours of a news result from its snippet's time prefix, or None"""
+    now = now or datetime.now(timezone.utc)
+    match = _ISO_PREFIX.match(snippet)
+    if match:
+        try:
+            published = datetime.fromisoformat(match.group(1).replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if published.tzinfo is None:
+            published = published.replace(tzinfo=timezone.utc)
+        return max((now - published) / timedelta(hours=1), 0.0)
+    match = _RELATIVE_PREFIX.match(snippet)
+    if match:
+        return int(match.group(1)) * _RELATIVE_UNITS[match.group(2).lower()]
+    return None
+
+def strip_time_prefix(snippet):
+    """Return a news snippet without its leading time value"""
+    match = _ISO_PREFIX.match(snippet) or _RELATIVE_PREFIX.match(snippet)
+    return snippet[match.end():] if match else snippet
+
+def bm25_scores(query, documents):
+    """
+    Score tokenized documents against the query with BM25.
+    Only the query's terms are materialized as columns of the term-frequency matrix.
+    """
+    query_terms = list(dict.fromkeys(tokenize(query)))
+    if not query_terms or not documents:
+        return np.zeros(len(documents))
+
+    columns = {term: j for j, term in enumerate(query_terms)}
+    tf = np.zeros((len(documents), len(query_terms)))
+    lengths = np.empty(len(documents))
+    for i, tokens in enumerate(documents):
+        lengths[i] = len(tokens)
+        hits = [columns[token] for token in tokens if token in columns]
+        if hits:
+            np.add.at(tf[i], hits, 1)
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log1p((len(documents) - df + 0.5) / (df + 0.5))
+    norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(lengths.mean(), 1.0))
+    return (tf * (BM25_K1 + 1) / (tf + norm[:, None])) @ idf
+
+def score_results(query, results, now=None):
+    """Combine BM25 relevance over title and snippet with source weight and news freshness"""
+    documents = [
+        tokenize(result.get('title', '')) * TITLE_WEIGHT + tokenize(result.get('snippet', ''))
+        for result in results
+    ]
+    relevance = bm25_scores(query, documents)
+    if relevance.size and relevance.max() > 0:
+        relevance = relevance / relevance.max()
+
+    ages = np.array([
+        published_age_hours(result.get('snippet', ''), now) if result.get('source') == 'News' else None
+        for result in results
+    ], dtype=float)
+    freshness = np.nan_to_num(0.5 ** (ages / FRESHNESS_HALF_LIFE), nan=0.0)
+
+    weights = np.array([SOURCE_WEIGHTS.get(result.get('source'), DEFAULT_SOURCE_WEIGHT) for result in results])
+    return weights * (relevance + FRESHNESS_WEIGHT * freshness)
+
+def rank_results(query, results, limit, now=None):
+    """
+    Return the `limit` best results, best first.
+    A partial sort picks the top candidates; ties keep their original order.
+    """
+    if not results or limit <= 0:
+        return []
+    scores = score_results(query, results, now)
+    if len(results) > limit:
+        top = np.argpartition(-scores, limit - 1)[:limit]
+    else:
+        top = np.arange(len(results))
+    order = top[np.lexsort((top, -scores[top]))]
+    return [results[i] for i in order]
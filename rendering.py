@@ -0,0 +1,112 @@
+import hashlib
+import io
+import json
+from cache import TTLCache
+
+# Charts are drawn in the browser by plotly; matplotlib only renders download files
+EXPORT_DPI = 300
+EXPORT_SIZE = (10, 6)
+
+MIME_TYPES = {
+    'png': 'image/png',
+    'svg': 'image/svg+xml',
+}
+
+# Plotly line dashes and marker symbols as matplotlib styles
+_LINE_STYLES = {'solid': '-', 'dash': '--', 'dot': ':', 'dashdot': '-.'}
+_MARKERS = {'circle': 'o', 'square': 's', 'diamond': 'D', 'triangle-up': '^'}
+
+# Rendered image bytes by (chart key, format, dpi)
+_render_cache = TTLCache(maxsize=64, ttl=60 * 60)
+
+def chart_key(spec):
+    """Identify a chart by a hash of its spec"""
+    payload = json.dumps(spec, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def _axis_title(layout, axis):
+    return layout.get(axis, {}).get('title', {}).get('text', '')
+
+def _plot_trace(ax, trace, index, bar_count):
+    """Draw one plotly trace on a matplotlib axes"""
+    kind = trace.get('type', 'scatter')
+    color = trace.get('marker', {}).get('color') or trace.get('line', {}).get('color')
+    alpha = trace.get('opacity', 1.0)
+
+    if kind == 'scatter':
+        line = trace.get('line', {})
+        ax.plot(trace['x'], trace['y'], color=color, label=trace.get('name'),
+                linestyle=_LINE_STYLES.get(line.get('dash', 'solid'), '-'),
+                linewidth=line.get('width', 2),
+                marker=_MARKERS.get(trace.get('marker', {}).get('symbol')) if 'markers' in trace.get('mode', '') else None)
+    elif kind == 'bar' and trace.get('orientation') == 'h':
+        ax.barh(trace['y'], trace['x'], color=color, alpha=alpha, label=trace.get('name'))
+        for i, text in enumerate(trace.get('text', [])):
+            ax.text(trace['x'][i], i, f" {text}", va='center')
+    elif kind == 'bar':
+        # Grouped bars sit side by side around each category
+        width = 0.8 / bar_count
+        positions = [i + (index - (bar_count - 1) / 2) * width for i in range(len(trace['x']))]
+        ax.bar(positions, trace['y'], width, color=color, alpha=alpha, label=trace.get('name'))
+        ax.set_xticks(range(len(trace['x'])))
+        ax.set_xticklabels(trace['x'])
+    elif kind == 'scatterpolar':
+        import numpy as np
+        # Theta labels are categories spread evenly round the circle, last one closing the loop
+        labels = trace['theta'][:-1]
+        angles = np.linspace(0, 2 * np.pi, len(labels), endpoint=False).tolist()
+        angles += angles[:1]
+        line, = ax.plot(angles, trace['r'], color=color, linewidth=2, label=trace.get('name'))
+        ax.fill(angles, trace['r'], color=line.get_color(), alpha=0.1)
+        ax.set_xticks(angles[:-1])
+        ax.set_xticklabels(labels)
+
+def figure_from_spec(spec):
+    """Draw a chart spec as a matplotlib figure for static export"""
+    from matplotlib.figure import Figure
+
+    traces = spec.get('data', [])
+    layout = spec.get('layout', {})
+    polar = any(trace.get('type') == 'scatterpolar' for trace in traces)
+
+    # Figures are created outside pyplot's global registry, so they are freed after export
+    fig = Figure(figsize=EXPORT_SIZE)
+    ax = fig.add_subplot(111, polar=polar)
+
+    bars = [trace for trace in traces if trace.get('type') == 'bar']
+    for trace in traces:
+        index = bars.index(trace) if trace in bars else 0
+        _plot_trace(ax, trace, index, len(bars))
+
+    ax.set_title(layout.get('title', {}).get('text', ''), fontsize=16, fontweight='bold')
+    if not polar:
+        ax.set_xlabel(_axis_title(layout, 'xaxis'), fontsize=12)
+        ax.set_ylabel(_axis_title(layout, 'yaxis'), fontsize=12)
+        if layout.get('xaxis', {}).get('tickangle'):
+            ax.tick_params(axis='x', rotation=-layout['xaxis']['tickangle'])
+        if layout.get('yaxis', {}).get('autorange') == 'reversed':
+            ax.invert_yaxis()
+    ax.grid(True, linestyle='--', alpha=0.7)
+    if layout.get('showlegend', True) and traces:
+        ax.legend(loc='best')
+    fig.tight_layout()
+    return fig
+
+def render_spec(spec, fmt='png', dpi=EXPORT_DPI, key=None):
+    """
+    Return the chart spec rendered as PNG or SVG bytes.
+    With a chart key the bytes are cached, so repeated downloads don't re-render.
+    """
+    cache_key = (key, fmt, dpi) if key is not None else None
+    if cache_key is not None:
+        cached = _render_cache.get(cache_key)
+        if cached is not None:
+            return cached
+
+    buf = io.BytesIO()
+    figure_from_spec(spec).savefig(buf, format=fmt, dpi=dpi, bbox_inches='tight')
+    image = buf.getvalue()
+
+    if cache_key is not None:
+        _render_cache.set(cache_key, image)
+    return image
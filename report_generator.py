@@ -1,84 +1,85 @@
 import os
-import re
+import hashlib
 from datetime import datetime
 import random
-from collections import Counter
+import tracing
+from prompt_builder import build_writer_prompt, format_result
+from streaming import stream_chat, agent_model, agent_endpoint
+from term_matcher import TermCounter
+from text_analysis import get_corpus
+from domain_classifier import classify
+from singleflight import SingleFlight
+from search_engine import run_reviews, meta_review_message, llm_response_cache
+
+# Financial-related terms counted by extract_financial_content
+FINANCIAL_TERMS = [
+    'stock', 'market', 'price', 'investment', 'financial', 'economy', 'profit',
+    'loss', 'growth', 'decline', 'shares', 'investor', 'trend', 'forecast',
+    'capital', 'revenue', 'income', 'expenditure', 'assets', 'liabilities',
+    'credit', 'debt', 'loan', 'interest rate', 'dividends', 'portfolio',
+    'mutual funds', 'hedge funds', 'ETF', 'cryptocurrency', 'bitcoin', 'blockchain',
+    'forex', 'trading', 'exchange', 'inflation', 'deflation', 'GDP', 'bonds',
+    'equity', 'derivatives', 'commodities', 'fiscal policy', 'monetary policy',
+    'taxation', 'banking', 'mortgage', 'real estate', 'insurance', 'wealth management',
+    'pension', 'retirement', 'venture capital', 'private equity', 'IPO', 'bear market',
+    'bull market', 'leverage', 'risk management', 'liquidity', 'accounting',
+    'financial statements', 'cash flow', 'balance sheet', 'income statement'
+]
+FINANCIAL_TERM_COUNTER = TermCounter(FINANCIAL_TERMS)
+
+# Healthcare-related terms counted by extract_healthcare_content
+HEALTHCARE_TERMS = [
+    'health', 'medical', 'treatment', 'clinical', 'drug', 'therapy', 'patient',
+    'disease', 'condition', 'vaccine', 'healthcare', 'doctor', 'hospital', 'trial',
+    'medicine', 'diagnosis', 'symptom', 'prescription', 'surgery', 'operation',
+    'mental health', 'wellness', 'nutrition', 'pharmaceutical', 'public health',
+    'epidemic', 'pandemic', 'virus', 'infection', 'antibiotic', 'immune system',
+    'genetics', 'biotechnology', 'biomedicine', 'telemedicine', 'wearable health',
+    'nursing', 'physician', 'cardiology', 'oncology', 'neurology', 'radiology',
+    'dermatology', 'gastroenterology', 'orthopedics', 'ophthalmology', 'urology',
+    'gynecology', 'pediatrics', 'anesthesia', 'ICU', 'emergency care', 'first aid',
+    'health monitoring', 'blood test', 'X-ray', 'MRI', 'CT scan', 'ultrasound',
+    'mental illness', 'therapy session', 'rehabilitation', 'home care',
+    'dietary supplement', 'alternative medicine', 'holistic health'
+]
+HEALTHCARE_TERM_COUNTER = TermCounter(HEALTHCARE_TERMS)
+
+# Technology-related terms counted by extract_technology_content
+TECH_TERMS = [
+    'technology', 'software', 'digital', 'innovation', 'app', 'development',
+    'system', 'platform', 'data', 'ai', 'artificial intelligence', 
+    'machine learning', 'algorithm', 'gadgets', 'grocery', 'automation', 
+    'robotics', 'deep learning', 'neural network', 'big data', 'cloud computing',
+    'cybersecurity', 'blockchain', 'IoT', 'internet of things', 'quantum computing',
+    'virtual reality', 'augmented reality', 'metaverse', '5G', 'nanotechnology',
+    'biotechnology', 'computing', 'sensors', 'mobile', 'smartphone', 'tablet',
+    'laptop', 'server', 'database', 'networking', 'API', 'web development',
+    'frontend', 'backend', 'full stack', 'devops', 'containerization', 'docker',
+    'kubernetes', 'microservices', 'edge computing', 'AI ethics', 'LLM', 
+    'chatbot', 'NLP', 'natural language processing', 'computer vision', 'automation tools'
+]
+TECH_TERM_COUNTER = TermCounter(TECH_TERMS)
 
 def extract_specific_content(results, query):
     """
     Extract and organize specific content from search results to create
     a more detailed and topic-specific report.
     """
-    # Combine all text from search results
-    all_text = ""
-    for result in results:
-        all_text += result.get('title', '') + " " + result.get('snippet', '') + " "
-    
-    # Clean text
-    all_text = all_text.lower()
-    
-    # Identify specific content based on the query type
-    query_lower = query.lower()
-    
-    # Initialize content sections
-    content = {
-        'executive_summary': "",
-        'key_findings': "",
-        'background': "",
-        'trends': "",
-        'expert_insights': "",
-        'technical_details': "",
-        'impact': "",
-        'data_analysis': "",
-        'future_outlook': "",
-        'recommendations': "",
-        'conclusion': ""
-    }
-    
-    # Extract relevant information based on query type
-    if any(term in query_lower for term in ['stock', 'market', 'price', 'investment', 'financial','Sports','Entertainment','Art and culture','trending news']):
-        # Financial topic
-        content = extract_financial_content(results, query, all_text)
-    elif any(term in query_lower for term in ['health', 'covid', 'vaccine', 'medical', 'disease', 'treatment','Hospital']):
-        # Healthcare topic
-        content = extract_healthcare_content(results, query, all_text)
-    elif any(term in query_lower for term in ['tech', 'technology', 'ai', 'software', 'digital', 'app','Mobile Phones','Laptop']):
-        # Technology topic
-        content = extract_technology_content(results, query, all_text)
-    elif any(term in query_lower for term in ['coding','enginering','Business Intelligence','Data-Science']):
-        # Technology topic
-        content = extract_technology_content(results, query, all_text)
-    else:
-        # General topic
-        content = extract_general_content(results, query, all_text)
+    # Lowercased text, tokens and word counts, shared with the visualization
+    corpus = get_corpus(results)
     
-    return content
+    # Route through the shared domain classifier, the same decision the visualization uses
+    domain = classify(query, results)
+    extractor = REPORT_EXTRACTORS.get(domain, extract_general_content)
+    return extractor(results, query, corpus)
 
-def extract_financial_content(results, query, all_text):
+def extract_financial_content(results, query, corpus):
     """Extract financial-specific content from search results"""
     # Initialize content structure
     content = {}
     
-    # Expanded list of financial-related terms
-    financial_terms = [
-        'stock', 'market', 'price', 'investment', 'financial', 'economy', 'profit',
-        'loss', 'growth', 'decline', 'shares', 'investor', 'trend', 'forecast',
-        'capital', 'revenue', 'income', 'expenditure', 'assets', 'liabilities',
-        'credit', 'debt', 'loan', 'interest rate', 'dividends', 'portfolio',
-        'mutual funds', 'hedge funds', 'ETF', 'cryptocurrency', 'bitcoin', 'blockchain',
-        'forex', 'trading', 'exchange', 'inflation', 'deflation', 'GDP', 'bonds',
-        'equity', 'derivatives', 'commodities', 'fiscal policy', 'monetary policy',
-        'taxation', 'banking', 'mortgage', 'real estate', 'insurance', 'wealth management',
-        'pension', 'retirement', 'venture capital', 'private equity', 'IPO', 'bear market',
-        'bull market', 'leverage', 'risk management', 'liquidity', 'accounting',
-        'financial statements', 'cash flow', 'balance sheet', 'income statement'
-    ]
-
-    
     # Count financial terms
-    term_count = {}
-    for term in financial_terms:
-        term_count[term] = len(re.findall(r'\b' + term + r'\b', all_text))
+    term_count = FINANCIAL_TERM_COUNTER.count(corpus.text)
     
     # Generate content sections
     
@@ -268,32 +269,13 @@ Ultimately, {random.choice(['informed decision-making', 'strategic planning', 'c
     
     return content
 
-def extract_healthcare_content(results, query, all_text):
+def extract_healthcare_content(results, query, corpus):
     """Extract healthcare-specific content from search results"""
     # Initialize content structure
     content = {}
     
-   # Expanded list of healthcare-related terms
-    healthcare_terms = [
-        'health', 'medical', 'treatment', 'clinical', 'drug', 'therapy', 'patient',
-        'disease', 'condition', 'vaccine', 'healthcare', 'doctor', 'hospital', 'trial',
-        'medicine', 'diagnosis', 'symptom', 'prescription', 'surgery', 'operation',
-        'mental health', 'wellness', 'nutrition', 'pharmaceutical', 'public health',
-        'epidemic', 'pandemic', 'virus', 'infection', 'antibiotic', 'immune system',
-        'genetics', 'biotechnology', 'biomedicine', 'telemedicine', 'wearable health',
-        'nursing', 'physician', 'cardiology', 'oncology', 'neurology', 'radiology',
-        'dermatology', 'gastroenterology', 'orthopedics', 'ophthalmology', 'urology',
-        'gynecology', 'pediatrics', 'anesthesia', 'ICU', 'emergency care', 'first aid',
-        'health monitoring', 'blood test', 'X-ray', 'MRI', 'CT scan', 'ultrasound',
-        'mental illness', 'therapy session', 'rehabilitation', 'home care',
-        'dietary supplement', 'alternative medicine', 'holistic health'
-    ]
-
-    
     # Count healthcare terms
-    term_count = {}
-    for term in healthcare_terms:
-        term_count[term] = len(re.findall(r'\b' + term + r'\b', all_text))
+    term_count = HEALTHCARE_TERM_COUNTER.count(corpus.text)
     
     # Generate content sections based on healthcare themes
     
@@ -481,31 +463,13 @@ Ultimately, {random.choice(['optimized patient outcomes', 'improved clinical res
     
     return content
 
-def extract_technology_content(results, query, all_text):
+def extract_technology_content(results, query, corpus):
     """Extract technology-specific content from search results"""
     # Initialize content structure
     content = {}
     
-    # Expanded list of technology-related terms
-    tech_terms = [
-        'technology', 'software', 'digital', 'innovation', 'app', 'development',
-        'system', 'platform', 'data', 'ai', 'artificial intelligence', 
-        'machine learning', 'algorithm', 'gadgets', 'grocery', 'automation', 
-        'robotics', 'deep learning', 'neural network', 'big data', 'cloud computing',
-        'cybersecurity', 'blockchain', 'IoT', 'internet of things', 'quantum computing',
-        'virtual reality', 'augmented reality', 'metaverse', '5G', 'nanotechnology',
-        'biotechnology', 'computing', 'sensors', 'mobile', 'smartphone', 'tablet',
-        'laptop', 'server', 'database', 'networking', 'API', 'web development',
-        'frontend', 'backend', 'full stack', 'devops', 'containerization', 'docker',
-        'kubernetes', 'microservices', 'edge computing', 'AI ethics', 'LLM', 
-        'chatbot', 'NLP', 'natural language processing', 'computer vision', 'automation tools'
-    ]
-
-    
     # Count technology terms
-    term_count = {}
-    for term in tech_terms:
-        term_count[term] = len(re.findall(r'\b' + term + r'\b', all_text))
+    term_count = TECH_TERM_COUNTER.count(corpus.text)
     
     # Generate content sections based on technology themes
     
@@ -697,27 +661,13 @@ essential to {random.choice(['maximize value', 'optimize benefits', 'ensure succ
     
     return content
 
-def extract_general_content(results, query, all_text):
+def extract_general_content(results, query, corpus):
     """Extract general content from search results for any other topic"""
     # Initialize content structure
     content = {}
     
-    # Extract all words (excluding stopwords) for frequency analysis
-    stopwords = [
-        'the', 'a', 'an', 'and', 'or', 'but', 'is', 'are', 'was', 'were', 'been', 'being',
-        'have', 'has', 'had', 'do', 'does', 'did', 'doing', 'to', 'from', 'by', 'with', 
-        'about', 'against', 'between', 'into', 'through', 'during', 'before', 'after', 
-        'above', 'below', 'of', 'at', 'in', 'on', 'for', 'this', 'that', 'these', 'those',
-        'it', 'its', 'they', 'them', 'their', 'which', 'who', 'whom', 'what', 'when', 'where'
-    ]
-    
-    # Clean text and extract words
-    cleaned_text = re.sub(r'[^\w\s]', '', all_text.lower())
-    words = [word for word in cleaned_text.split() if word not in stopwords and len(word) > 2]
-    
-    # Get word frequencies
-    word_counts = Counter(words)
-    most_common = word_counts.most_common(20)
+    # Get word frequencies (stopwords excluded)
+    most_common = corpus.word_counts.most_common(20)
     
     # Use most common words to determine key themes
     key_themes = [word for word, count in most_common[:5]]
@@ -895,8 +845,110 @@ the value and relevance of {query} is likely to {random.choice(['grow', 'increas
     
     return content
 
+# Report template per domain. Trending-news queries keep the financial template they were
+# routed to before; sports, entertainment and culture have no template of their own.
+REPORT_EXTRACTORS = {
+    'financial': extract_financial_content,
+    'sports': extract_general_content,
+    'entertainment': extract_general_content,
+    'culture': extract_general_content,
+    'news': extract_financial_content,
+    'healthcare': extract_healthcare_content,
+    'technology': extract_technology_content,
+    'general': extract_general_content,
+}
+
+# Identical reports and reviews requested at the same time are written once and shared
+report_flight = SingleFlight("report")
+report_stream_flight = SingleFlight("report_stream")
+review_stream_flight = SingleFlight("review_stream")
+
+def report_key(agents, search_results):
+    """Identify a report by the writer's model, endpoint and credentials and the results it is written from"""
+    writer = agents.get("writer")
+    return (
+        agent_endpoint(writer) if writer else None,
+        search_results.get('query'),
+        search_results.get('search_date'),
+        tuple(result.get('link', '') for result in search_results.get('results', [])),
+    )
+
 def generate_report(agents, search_results):
-    """Generate a comprehensive report based on search results using the writer agent"""
+    """
+    Generate a comprehensive report based on search results using the writer agent
+    Concurrent calls for the same results share one report
+    """
+    report, _ = report_flight.do(report_key(agents, search_results), _write_report, agents, search_results)
+    return report
+
+def _write_report(agents, search_results):
+    with tracing.span("report") as report_span:
+        report = _generate_report(agents, search_results, report_span)
+        report_span.set(chars=len(report))
+        return report
+
+def stream_report(agents, search_results):
+    """
+    Stream the writer's report as it is generated, falling back to the templated report
+    Concurrent callers for the same results share one stream from the writer
+    """
+    yield from report_stream_flight.stream(report_key(agents, search_results), _stream_report, agents, search_results)
+
+def _stream_report(agents, search_results):
+    writer = agents.get("writer")
+    if not writer:
+        yield "Error: Required agents not found for report generation."
+        return
+
+    query = search_results.get('query', 'Not specified')
+    search_date = search_results.get('search_date', datetime.now().strftime('%Y-%m-%d'))
+    writer_prompt = build_writer_prompt(
+        query, search_date, search_results.get('results', []),
+        search_results.get('analysis_prompt', ''),
+        model=agent_model(writer), system_message=writer.system_message
+    )
+    yield from stream_chat(
+        writer, writer_prompt['prompt'],
+        fallback=lambda: generate_report(agents, search_results),
+        span_name="report_stream",
+        cache=llm_response_cache
+    )
+
+def stream_review(agents, report):
+    """
+    Stream reviewer feedback on a report; `report` may be a finished TextStream
+    The critic's specialist reviewers run in parallel first, then the meta reviewer's verdict on
+    their summaries is streamed. If no review comes back, the critic's own review is streamed
+    instead. Concurrent reviews of the same report share one run.
+    """
+    critic = agents.get("critic")
+    text = str(report)
+    if not critic or not text:
+        return
+    key = (agent_endpoint(critic), hashlib.sha256(text.encode('utf-8')).hexdigest())
+    yield from review_stream_flight.stream(key, _review, agents, text)
+
+def _review(agents, text):
+    writer, critic = agents.get("writer"), agents.get("critic")
+    meta_reviewer, review_chats = agents.get("meta_reviewer"), agents.get("review_chats")
+    if writer and meta_reviewer and review_chats:
+        # The same chats the critic runs as nested chats, with the last reply streamed
+        *reviews, meta_chat = review_chats
+        messages = [{'role': 'user', 'name': writer.name, 'content': text}]
+        summaries = run_reviews(reviews, critic, messages, writer, None)
+        if summaries:
+            meta_prompt = meta_review_message(meta_chat, summaries, critic, messages, writer, None)
+            yield from stream_chat(meta_reviewer, meta_prompt, span_name="review_stream", cache=llm_response_cache)
+            return
+
+    review_prompt = f"""Review the following report and give concise, actionable feedback.
+
+{text}
+"""
+    yield from stream_chat(critic, review_prompt, span_name="review_stream", cache=llm_response_cache)
+
+def _generate_report(agents, search_results, report_span):
+    """Build the report text; errors are returned as the report message"""
     try:
         # Extract writer agent
         writer = agents.get("writer")
@@ -911,36 +963,17 @@ def generate_report(agents, search_results):
         results = search_results.get('results', [])
         analysis_prompt = search_results.get('analysis_prompt', '')
         
-        # Format the results for the writer
-        formatted_results = ""
-        for i, result in enumerate(results):
-            formatted_results += f"""
-Result {i+1}:
-Title: {result.get('title', 'No title')}
-Link: {result.get('link', '#')}
-Snippet: {result.get('snippet', 'No snippet')}
----
-"""
-
-        # Prepare the prompt for the writer
-        writer_prompt = f"""
-# REPORT GENERATION TASK
-
-## Search Information
-- Query: {query}
-- Date: {search_date}
-- Number of results: {len(results)}
-
-## Search Results
-{formatted_results}
-
-## Report Instructions
-{analysis_prompt}
-
-Please generate a comprehensive, well-structured report based on the search results above.
-Organize the information in a clear, logical manner with proper headings, subheadings, and markdown formatting.
-Include relevant insights, analysis, and recommendations where appropriate.
-"""
+        # The templated report doesn't send a prompt; it is only built to record its token accounting
+        if tracing.is_enabled():
+            writer_prompt = build_writer_prompt(
+                query, search_date, results, analysis_prompt,
+                model=agent_model(writer), system_message=writer.system_message
+            )
+            report_span.set(
+                prompt_tokens=writer_prompt['tokens'],
+                prompt_budget=writer_prompt['budget'],
+                prompt_results=writer_prompt['results_used'],
+            )
 
         # In a real implementation with AutoGen, the agents would communicate to generate the report
         # Here we'll create a more detailed and specific report based on the search results
@@ -994,7 +1027,7 @@ The research examines key developments, current trends, expert opinions, and fut
 ## Sources
 The following sources were consulted for this report:
 
-{formatted_results}
+{"".join(format_result(i + 1, result) for i, result in enumerate(results))}
 
 ---
 *This report was automatically generated by the Multi-Agent AI Search Engine*
@@ -0,0 +1,69 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+# Past searches kept per session for the sidebar history
+MAX_HISTORY = 20
+
+def query_id(query, model=None):
+    """Identify a search by its normalized query text and model"""
+    normalized = " ".join(query.lower().split())
+    return hashlib.sha1(f"{model}|{normalized}".encode('utf-8')).hexdigest()[:12]
+
+class StoredSearch:
+    """One finished search: its results, chart, report text and memoized rendered fragments"""
+
+    __slots__ = ('id', 'query', 'model', 'created', 'search_results', 'visualization_data',
+                 'report', 'review', 'fragments')
+
+    def __init__(self, query, model, search_results, visualization_data):
+        self.id = query_id(query, model)
+        self.query = query
+        self.model = model
+        self.created = time.time()
+        self.search_results = search_results
+        self.visualization_data = visualization_data
+        self.report = None
+        self.review = None
+        self.fragments = {}
+
+    def fragment(self, name, build):
+        """Return the named rendered fragment, building it on first use"""
+        if name not in self.fragments:
+            self.fragments[name] = build()
+        return self.fragments[name]
+
+class ResultsStore:
+    """
+    Finished searches of one session keyed by query ID, newest first.
+    Searching the same query again replaces its entry; the oldest entries are dropped past maxsize.
+    """
+
+    def __init__(self, maxsize=MAX_HISTORY):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, query, search_results, visualization_data, model=None):
+        """Store a finished search and return its entry"""
+        search = StoredSearch(query, model, search_results, visualization_data)
+        with self._lock:
+            self._entries[search.id] = search
+            self._entries.move_to_end(search.id, last=False)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=True)
+        return search
+
+    def get(self, search_id):
+        """Return the stored search with this ID, or None"""
+        with self._lock:
+            return self._entries.get(search_id)
+
+    def history(self):
+        """Return the stored searches, newest first"""
+        with self._lock:
+            return list(self._entries.values())
+
+    def __len__(self):
+        return len(self._entries)
@@ -1,11 +1,25 @@
 import autogen
 from datetime import datetime
 import json
-import requests
-from bs4 import BeautifulSoup
+import transport
+import parsing
+import tracing
 from urllib.parse import quote_plus
 import time
 import random
+import copy
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from cache import TieredCache
+from llm_cache import SemanticLLMCache
+from ranking import rank_results
+from dedup import Deduplicator
+from enrichment import enrich_results, ENRICH_CONTENT
+from singleflight import SingleFlight
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 
 def create_search_agents(llm_config):
     """Create and configure all the necessary agents for the search engine"""
@@ -229,60 +243,85 @@ def create_search_agents(llm_config):
     )
 
     # Set up reviewer chat flow
+    def review_sender():
+        # Parallel reviews each get their own stand-in for the critic so concurrent
+        # chats never share per-conversation agent state
+        return autogen.ConversableAgent(
+            name=critic.name,
+            llm_config=False,
+            human_input_mode="NEVER",
+        )
+
     def reflection_message(recipient, messages, sender, config):
         return f'''Review the following content. 
-                \n\n {recipient.chat_messages_for_summary(sender)[-1]['content']}'''
+                \n\n {messages[-1]['content']}'''
 
     review_chats = [
         {
             "recipient": legal_reviewer, 
+            "sender": review_sender(),
             "message": reflection_message, 
             "summary_method": "reflection_with_llm",
             "summary_args": {
                 "summary_prompt": "Return review into a JSON object only: {'Reviewer': '', 'Review': ''}."
             },
-            "max_turns": 1
+            "max_turns": 1,
+            "cache": llm_response_cache
         },
         {
             "recipient": textalignment_reviewer, 
+            "sender": review_sender(),
             "message": reflection_message, 
             "summary_method": "reflection_with_llm",
             "summary_args": {
                 "summary_prompt": "Return review into a JSON object only: {'reviewer': '', 'review': ''}"
             },
-            "max_turns": 1
+            "max_turns": 1,
+            "cache": llm_response_cache
         },
         {
             "recipient": consistency_reviewer, 
+            "sender": review_sender(),
             "message": reflection_message, 
             "summary_method": "reflection_with_llm",
             "summary_args": {
                 "summary_prompt": "Return review into a JSON object only: {'reviewer': '', 'review': ''}"
             },
-            "max_turns": 1
+            "max_turns": 1,
+            "cache": llm_response_cache
         },
         {
             "recipient": completion_reviewer, 
+            "sender": review_sender(),
             "message": reflection_message, 
             "summary_method": "reflection_with_llm",
             "summary_args": {
                 "summary_prompt": "Return review into a JSON object only: {'reviewer': '', 'review': ''}"
             },
-            "max_turns": 1
+            "max_turns": 1,
+            "cache": llm_response_cache
         },
         {
             "recipient": meta_reviewer, 
             "message": "Aggregate feedback from all reviewers and give final suggestions on the writing.", 
-            "max_turns": 1
+            "max_turns": 1,
+            "cache": llm_response_cache
         },
     ]
 
+    # Chats and streams pass llm_response_cache explicitly: autogen swaps an agent's
+    # client_cache for the chat's own cache argument while a chat runs, so a cache set on
+    # the agent is lost to any concurrent call on the same agent set
+    # The four reviewers run concurrently; the meta reviewer aggregates their summaries
     critic.register_nested_chats(
         review_chats,
         trigger=writer,
+        reply_func_from_nested_chats=parallel_review_reply,
     )
 
     return {
+        # The nested chat queue, so reviews can also be run with a streamed final verdict
+        "review_chats": review_chats,
         "ai_task_assistant": ai_task_assistant,
         "research_assistant": research_assistant,
         "writer": writer,
@@ -296,88 +335,301 @@ def create_search_agents(llm_config):
         "user_proxy": user_proxy
     }
 
-def search_web(query, num_results=15):
+# LLM responses keyed by normalized prompt; LLM_CACHE_MODE=near also reuses near-duplicate prompts
+llm_response_cache = SemanticLLMCache(
+    maxsize=512,
+    ttl=6 * 60 * 60,
+    near_duplicate=os.environ.get("LLM_CACHE_MODE", "exact") == "near",
+    threshold=float(os.environ.get("LLM_CACHE_THRESHOLD", "0.9")),
+)
+
+# Built agent sets, keyed by session, model, endpoint and API key hash, most recently used last
+AGENT_REGISTRY_SIZE = 64
+_agent_registry = OrderedDict()
+_agent_registry_lock = threading.Lock()
+
+def agent_config_key(llm_config):
+    """Identify an LLM configuration without keeping the raw API key around"""
+    config = llm_config["config_list"][0]
+    api_key_hash = hashlib.sha256(config.get("api_key", "").encode("utf-8")).hexdigest()
+    return (config.get("model"), config.get("base_url"), api_key_hash)
+
+def get_search_agents(llm_config, session_id=None):
     """
-    Perform a comprehensive web search for the given query and return results from multiple sources
+    Return the session's agents for this configuration, building them only the first time it is seen.
+    Agents keep chat history and reply state, so each session gets its own set; it is reused
+    across that session's queries until invalidated or evicted.
     """
-    search_results = []
-    
-    # Try multiple search sources to get diverse results
-    google_results = search_google(query, num_results=num_results//2)
-    search_results.extend(google_results)
-    
-    # Try to fetch additional data from other sources
-    wikipedia_results = search_wikipedia(query, num_results=3)
-    search_results.extend(wikipedia_results)
+    key = (session_id,) + agent_config_key(llm_config)
+    with _agent_registry_lock:
+        agents = _agent_registry.get(key)
+        if agents is not None:
+            _agent_registry.move_to_end(key)
+            return agents
+
+        with tracing.span("create_agents", model=key[1]):
+            agents = create_search_agents(llm_config)
+        _agent_registry[key] = agents
+        while len(_agent_registry) > AGENT_REGISTRY_SIZE:
+            _agent_registry.popitem(last=False)
+        return agents
+
+def invalidate_search_agents(llm_config=None, session_id=None):
+    """Drop the cached agents for one configuration and/or session, or every agent set"""
+    config_key = agent_config_key(llm_config) if llm_config is not None else None
+    with _agent_registry_lock:
+        for key in list(_agent_registry):
+            if config_key is not None and key[1:] != config_key:
+                continue
+            if session_id is not None and key[0] != session_id:
+                continue
+            del _agent_registry[key]
+
+# Maximum number of reviewer chats in flight at once for a single review
+REVIEW_MAX_CONCURRENCY = 4
+
+def run_reviews(review_chats, recipient, messages, sender, config):
+    """
+    Run independent reviewer chats concurrently and return their summaries.
+    `messages` is the conversation under review; its last message is the content to review.
+    """
+    # Resolve the review messages up front, on the calling thread
+    pending = []
+    for chat in review_chats:
+        chat = chat.copy()
+        reviewer = chat.pop("recipient")
+        review_sender = chat.pop("sender", recipient)
+        message = chat.pop("message")
+        if callable(message):
+            message = message(recipient, messages, sender, config)
+        if message:
+            pending.append((review_sender, reviewer, message, chat))
+
+    summaries = []
+    with tracing.span("review", reviewers=len(pending)):
+        with ThreadPoolExecutor(max_workers=REVIEW_MAX_CONCURRENCY, thread_name_prefix="review") as executor:
+            futures = [
+                executor.submit(
+                    tracing.propagate(review_sender.initiate_chat), reviewer, message=message, **chat
+                )
+                for review_sender, reviewer, message, chat in pending
+            ]
+            for future, (_, reviewer, _, _) in zip(futures, pending):
+                try:
+                    summaries.append(future.result().summary)
+                except Exception as e:
+                    print(f"Error running review by {reviewer.name}: {str(e)}")
+    return summaries
+
+def meta_review_message(meta_chat, summaries, recipient, messages, sender, config):
+    """Return the meta reviewer's message with the review summaries carried over the way autogen does"""
+    message = meta_chat["message"]
+    if callable(message):
+        message = message(recipient, messages, sender, config)
+    return message + "\nContext: \n" + "\n".join(str(summary) for summary in summaries)
+
+def parallel_review_reply(chat_queue, recipient, messages, sender, config):
+    """
+    Nested-chat reply function for the critic.
+    Every chat except the last is an independent review and runs concurrently;
+    their summaries are then carried over into the last (meta reviewer) chat.
+    """
+    *review_chats, meta_chat = chat_queue
+    summaries = run_reviews(review_chats, recipient, messages, sender, config)
+
+    meta_chat = meta_chat.copy()
+    meta_reviewer = meta_chat.pop("recipient")
+    meta_sender = meta_chat.pop("sender", recipient)
+    message = meta_chat.pop("message")
+    if callable(message):
+        message = message(recipient, messages, sender, config)
+    result = meta_sender.initiate_chat(
+        meta_reviewer,
+        message=message,
+        carryover=[str(summary) for summary in summaries],
+        **meta_chat
+    )
+    return True, result.summary
+
+# Overall time budget for one query across every search source (seconds)
+SEARCH_DEADLINE = 12
+
+# Shared pool so concurrent queries reuse worker threads instead of spawning new ones
+_search_executor = ThreadPoolExecutor(max_workers=12, thread_name_prefix="search")
+
+# Whole-query result cache; set RESULT_CACHE_PATH to keep entries across app restarts
+RESULT_CACHE_TTL = 15 * 60
+result_cache = TieredCache(
+    maxsize=256,
+    ttl=RESULT_CACHE_TTL,
+    disk_path=os.environ.get("RESULT_CACHE_PATH"),
+)
+
+def normalize_query(query):
+    """Normalize query text so trivially different spellings share cache entries"""
+    return " ".join(query.lower().split())
+
+def result_cache_key(query, current_date, enrich=ENRICH_CONTENT):
+    """
+    Build the result cache key from the normalized query and the search date.
+    Enriched packages carry page text the plain ones lack, so they are keyed apart.
+    """
+    key = f"{current_date}:{normalize_query(query)}"
+    return f"enriched:{key}" if enrich else key
+
+# Candidates fetched per result returned; the surplus is ranked away in search_web_sources
+OVERFETCH_FACTOR = 2
+
+def _search_sources(num_results):
+    """Return the (source name, search function, result count) fan-out plan for a query"""
+    return [
+        ('Google Search', search_google, num_results//2),
+        ('Wikipedia', search_wikipedia, 3),
+        ('News', search_news, num_results//3),
+    ]
+
+def iter_search_web(query, num_results=15, deadline=SEARCH_DEADLINE):
+    """
+    Query every search source concurrently and yield (source name, results) as each one finishes.
+    Results are de-duplicated across batches by canonical URL and near-identical text, and
+    capped at num_results overall. Later duplicates are folded into the result already
+    yielded, which lists every source it came from in 'sources'.
+    Sources that raise are yielded with None in place of results, and so are the sources
+    that miss the overall deadline, last.
+    """
+    plan = _search_sources(num_results)
+    futures = {
+        _search_executor.submit(tracing.propagate(search_fn), query, num_results=count): name
+        for name, search_fn, count in plan
+    }
     
-    news_results = search_news(query, num_results=num_results//3)
-    search_results.extend(news_results)
+    deduplicator = Deduplicator()
+    try:
+        for future in as_completed(futures, timeout=deadline):
+            try:
+                source_results = future.result()
+            except Exception:
+                # The source logged its own error; like a timed-out one its results are missing
+                yield futures[future], None
+                continue
+
+            # Fold duplicates of results already yielded by faster sources into those results
+            with tracing.span("dedup", source=futures[future]) as dedup_span:
+                batch = []
+                for result in source_results:
+                    if len(deduplicator.kept) >= num_results:
+                        break
+                    kept = deduplicator.add(result)
+                    if kept is not None:
+                        batch.append(kept)
+                dedup_span.set(results=len(batch), collapsed=deduplicator.collapsed)
+            yield futures[future], batch
+    except FuturesTimeoutError:
+        for future, name in futures.items():
+            if not future.done():
+                # Running futures cannot be interrupted; their results are simply discarded
+                future.cancel()
+                print(f"Search source timed out: {name}")
+                yield name, None
+
+def search_web_sources(query, num_results=15, deadline=SEARCH_DEADLINE, on_batch=None):
+    """
+    Query every search source concurrently and wait at most `deadline` seconds.
+    Returns the merged results and the names of the sources that failed or missed the deadline.
+    If given, on_batch(source, results) is called with each source's new results as they arrive.
+    """
+    # Over-fetch candidates so ranking, not arrival order, decides what survives
+    candidates_wanted = num_results * OVERFETCH_FACTOR
+    source_results = {}
+    for name, batch in iter_search_web(query, num_results=candidates_wanted, deadline=deadline):
+        if batch is None:
+            continue
+        source_results[name] = batch
+        if on_batch is not None and batch:
+            on_batch(name, batch)
     
-    # Remove any duplicates based on URLs
-    seen_urls = set()
-    unique_results = []
-    for result in search_results:
-        if result['link'] not in seen_urls:
-            seen_urls.add(result['link'])
-            unique_results.append(result)
+    # Merge in plan order so ties don't depend on which source answered first
+    plan = _search_sources(candidates_wanted)
+    candidates = []
+    for name, _, _ in plan:
+        candidates.extend(source_results.get(name, []))
+    missing_sources = [name for name, _, _ in plan if name not in source_results]
     
-    # Return the top results
-    return unique_results[:num_results]
+    # Return the most relevant results
+    with tracing.span("rank", candidates=len(candidates)) as rank_span:
+        search_results = rank_results(query, candidates, num_results)
+        rank_span.set(results=len(search_results))
+    return search_results, missing_sources
+
+def search_web(query, num_results=15, deadline=SEARCH_DEADLINE):
+    """
+    Perform a comprehensive web search for the given query and return results from multiple sources
+    """
+    search_results, _ = search_web_sources(query, num_results=num_results, deadline=deadline)
+    return search_results
 
 def search_google(query, num_results=10):
-    """Search Google for the given query"""
+    """Search Google for the given query; errors are raised so the source is reported missing"""
     search_url = f"https://www.google.com/search?q={quote_plus(query)}"
     
-    # Headers to mimic a browser visit
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
-    
     try:
-        response = requests.get(search_url, headers=headers, timeout=10)
-        response.raise_for_status()
-        
-        soup = BeautifulSoup(response.text, 'html.parser')
-        
-        # Extract search results
-        search_results = []
-        for result in soup.select('div.g'):
-            title_element = result.select_one('h3')
-            link_element = result.select_one('a')
-            snippet_element = result.select_one('div.IsZvec')
-            
-            if title_element and link_element and snippet_element:
-                title = title_element.text
-                link = link_element['href'] if link_element.has_attr('href') else ""
-                snippet = snippet_element.text
-                
-                # Fix Google redirects if present
-                if isinstance(link, str) and link.startswith('/url?q='):
-                    link = link.split('/url?q=')[1].split('&')[0]
-                
-                search_results.append({
-                    'title': title,
-                    'link': link,
-                    'snippet': snippet,
-                    'source': 'Google Search'
-                })
-                
-                if len(search_results) >= num_results:
-                    break
+        with tracing.span("fetch", source="Google Search") as fetch_span:
+            response = transport.get(search_url)
+            fetch_span.add_bytes(len(response.content))
+            fetch_span.set(status=response.status_code)
+            response.raise_for_status()
         
+        with tracing.span("parse", source="Google Search") as parse_span:
+            search_results = parse_google_results(response.text, num_results=num_results)
+            parse_span.set(results=len(search_results))
         return search_results
     except Exception as e:
         print(f"Error searching Google: {str(e)}")
-        return []
+        raise
+
+def parse_google_results(html, num_results=10, parser=None, targeted=True):
+    """Extract search results from a Google results page"""
+    soup = parsing.parse_html(html, only=parsing.GOOGLE_RESULTS if targeted else None, parser=parser)
+    
+    # Extract search results
+    search_results = []
+    for result in soup.select('div.g'):
+        title_element = result.select_one('h3')
+        link_element = result.select_one('a')
+        snippet_element = result.select_one('div.IsZvec')
+        
+        if title_element and link_element and snippet_element:
+            title = title_element.text
+            link = link_element['href'] if link_element.has_attr('href') else ""
+            snippet = snippet_element.text
+            
+            # Fix Google redirects if present
+            if isinstance(link, str) and link.startswith('/url?q='):
+                link = link.split('/url?q=')[1].split('&')[0]
+            
+            search_results.append({
+                'title': title,
+                'link': link,
+                'snippet': snippet,
+                'source': 'Google Search'
+            })
+            
+            if len(search_results) >= num_results:
+                break
+    
+    return search_results
 
 def search_wikipedia(query, num_results=3):
-    """Search Wikipedia for the given query"""
+    """Search Wikipedia for the given query; errors are raised so the source is reported missing"""
     # Format the query for Wikipedia search
     search_url = f"https://en.wikipedia.org/w/api.php?action=opensearch&search={quote_plus(query)}&limit={num_results}&namespace=0&format=json"
     
     try:
-        response = requests.get(search_url, timeout=10)
-        response.raise_for_status()
+        with tracing.span("fetch", source="Wikipedia") as fetch_span:
+            response = transport.get(search_url)
+            fetch_span.add_bytes(len(response.content))
+            fetch_span.set(status=response.status_code)
+            response.raise_for_status()
         
         data = response.json()
         
@@ -386,27 +638,22 @@ def search_wikipedia(query, num_results=3):
         descriptions = data[2]
         urls = data[3]
         
+        # Fetch a bit more content in one batched request for every snippet that's too short
+        short_titles = [
+            titles[i] for i in range(min(len(titles), len(descriptions), len(urls)))
+            if len(descriptions[i]) < 100
+        ]
+        extracts = fetch_wikipedia_extracts(short_titles)
+        
         search_results = []
         for i in range(min(len(titles), len(descriptions), len(urls))):
             title = titles[i]
             snippet = descriptions[i]
             link = urls[i]
             
-            # Fetch a bit more content for the snippet if it's too short
-            if len(snippet) < 100:
-                try:
-                    article_url = f"https://en.wikipedia.org/w/api.php?action=query&prop=extracts&exintro&explaintext&titles={quote_plus(title)}&format=json"
-                    article_response = requests.get(article_url, timeout=10)
-                    article_data = article_response.json()
-                    
-                    # Extract the page content
-                    pages = article_data['query']['pages']
-                    page_id = list(pages.keys())[0]
-                    if 'extract' in pages[page_id]:
-                        extract = pages[page_id]['extract']
-                        snippet = extract[:250] + "..." if len(extract) > 250 else extract
-                except Exception as e:
-                    print(f"Error fetching Wikipedia article: {str(e)}")
+            if len(snippet) < 100 and title in extracts:
+                extract = extracts[title]
+                snippet = extract[:250] + "..." if len(extract) > 250 else extract
             
             search_results.append({
                 'title': title,
@@ -418,67 +665,133 @@ def search_wikipedia(query, num_results=3):
         return search_results
     except Exception as e:
         print(f"Error searching Wikipedia: {str(e)}")
-        return []
+        raise
 
-def search_news(query, num_results=5):
-    """Search for news related to the query"""
-    # Simulate fetching news results from Google News
-    search_url = f"https://news.google.com/search?q={quote_plus(query)}&hl=en-US&gl=US&ceid=US:en"
+def fetch_wikipedia_extracts(titles):
+    """
+    Fetch the intro extracts for several Wikipedia titles in a single API request.
+    Returns a dict mapping each requested title to its plain-text extract.
+    """
+    if not titles:
+        return {}
     
-    headers = {
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-    }
+    # TextExtracts returns at most 20 intro extracts per request
+    titles = titles[:20]
+    article_url = f"https://en.wikipedia.org/w/api.php?action=query&prop=extracts&exintro&explaintext&exlimit={len(titles)}&redirects&titles={quote_plus('|'.join(titles))}&format=json"
     
     try:
-        response = requests.get(search_url, headers=headers, timeout=10)
-        response.raise_for_status()
+        with tracing.span("fetch", source="Wikipedia", titles=len(titles)) as fetch_span:
+            article_response = transport.get(article_url)
+            fetch_span.add_bytes(len(article_response.content))
+            fetch_span.set(status=article_response.status_code)
+            article_response.raise_for_status()
+        article_data = article_response.json()
+        query_data = article_data.get('query', {})
         
-        soup = BeautifulSoup(response.text, 'html.parser')
+        # Pages come back keyed by page ID under their canonical title, so follow
+        # the normalization and redirect maps back to the title that was requested
+        canonical = {title: title for title in titles}
+        for mapping in query_data.get('normalized', []) + query_data.get('redirects', []):
+            for title, target in canonical.items():
+                if target == mapping['from']:
+                    canonical[title] = mapping['to']
         
-        # Extract news articles
-        search_results = []
-        articles = soup.select('article')
+        extracts_by_page = {
+            page['title']: page['extract']
+            for page in query_data.get('pages', {}).values()
+            if 'extract' in page
+        }
+        return {
+            title: extracts_by_page[target]
+            for title, target in canonical.items()
+            if target in extracts_by_page
+        }
+    except Exception as e:
+        print(f"Error fetching Wikipedia articles: {str(e)}")
+        return {}
+
+def search_news(query, num_results=5):
+    """Search for news related to the query; errors are raised so the source is reported missing"""
+    # Simulate fetching news results from Google News
+    search_url = f"https://news.google.com/search?q={quote_plus(query)}&hl=en-US&gl=US&ceid=US:en"
+    
+    try:
+        with tracing.span("fetch", source="News") as fetch_span:
+            response = transport.get(search_url)
+            fetch_span.add_bytes(len(response.content))
+            fetch_span.set(status=response.status_code)
+            response.raise_for_status()
         
-        for article in articles[:num_results]:
-            try:
-                # Extract title
-                title_element = article.select_one('h3 a, h4 a')
-                if not title_element:
-                    continue
-                title = title_element.text
-                
-                # Extract link
-                link = title_element.get('href', '')
-                if link and isinstance(link, str) and link.startswith('./'):
-                    link = f"https://news.google.com{link[1:]}"
-                
-                # Extract snippet
-                snippet_element = article.select_one('p, span.HO8did')
-                snippet = snippet_element.text if snippet_element else "News article related to the search query."
-                
-                # Add time if available
-                time_element = article.select_one('time')
-                if time_element:
-                    time_text = time_element.get('datetime', '') or time_element.text
-                    snippet = f"{time_text} - {snippet}"
-                
-                search_results.append({
-                    'title': title,
-                    'link': link,
-                    'snippet': snippet,
-                    'source': 'News'
-                })
-            except Exception as e:
-                print(f"Error parsing news article: {str(e)}")
-                continue
-                
+        with tracing.span("parse", source="News") as parse_span:
+            search_results = parse_news_results(response.text, num_results=num_results)
+            parse_span.set(results=len(search_results))
         return search_results
     except Exception as e:
         print(f"Error searching News: {str(e)}")
-        return []
+        raise
 
-def run_search(agents, query, current_date):
-    """Execute the search using the multi-agent system"""
+def parse_news_results(html, num_results=5, parser=None, targeted=True):
+    """Extract news articles from a Google News results page"""
+    soup = parsing.parse_html(html, only=parsing.NEWS_ARTICLES if targeted else None, parser=parser)
+    
+    # Extract news articles
+    search_results = []
+    articles = soup.select('article')
+    
+    for article in articles[:num_results]:
+        try:
+            # Extract title
+            title_element = article.select_one('h3 a, h4 a')
+            if not title_element:
+                continue
+            title = title_element.text
+            
+            # Extract link
+            link = title_element.get('href', '')
+            if link and isinstance(link, str) and link.startswith('./'):
+                link = f"https://news.google.com{link[1:]}"
+            
+            # Extract snippet
+            snippet_element = article.select_one('p, span.HO8did')
+            snippet = snippet_element.text if snippet_element else "News article related to the search query."
+            
+            # Add time if available
+            time_element = article.select_one('time')
+            if time_element:
+                time_text = time_element.get('datetime', '') or time_element.text
+                snippet = f"{time_text} - {snippet}"
+            
+            search_results.append({
+                'title': title,
+                'link': link,
+                'snippet': snippet,
+                'source': 'News'
+            })
+        except Exception as e:
+            print(f"Error parsing news article: {str(e)}")
+            continue
+            
+    return search_results
+
+# Identical searches running at the same time share one scrape
+search_flight = SingleFlight("search")
+
+def run_search(agents, query, current_date, on_batch=None, enrich=ENRICH_CONTENT):
+    """
+    Execute the search using the multi-agent system.
+    If given, on_batch(source, results) receives each source's results as soon as they arrive.
+    With enrich, the top results also get their page's main text as result['content'].
+    Concurrent calls for the same query and date share one search; callers that join a
+    search already in flight wait for it and don't receive on_batch calls.
+    """
+    result_package, shared = search_flight.do(
+        result_cache_key(query, current_date, enrich),
+        _run_search, agents, query, current_date, on_batch, enrich
+    )
+    return copy.deepcopy(result_package) if shared else result_package
+
+def _run_search(agents, query, current_date, on_batch, enrich):
+    """Scrape, rank and enrich the results for run_search"""
     
     # Format the AI task prompt
     ai_task_prompt = f"""
@@ -570,16 +883,34 @@ def run_search(agents, query, current_date):
  
     """
     
-    # In a real implementation, we would use the agents to perform the search
-    # For now, we'll simulate the search with our search_web function
-    search_results = search_web(query)
+    with tracing.span("run_search") as search_span:
+        # Serve repeated queries for the same day without scraping again
+        cache_key = result_cache_key(query, current_date, enrich)
+        cached_package = result_cache.get(cache_key)
+        search_span.set(cache_hit=cached_package is not None)
+        if cached_package is not None:
+            return copy.deepcopy(cached_package)
     
-    # Prepare the results to return
-    result_package = {
-        'query': query,
-        'search_date': current_date,
-        'results': search_results,
-        'analysis_prompt': writing_task
-    }
+        # In a real implementation, we would use the agents to perform the search
+        # For now, we'll simulate the search with our search_web function
+        search_results, missing_sources = search_web_sources(query, on_batch=on_batch)
+        search_span.set(results=len(search_results), missing_sources=len(missing_sources))
+        
+        # Add full article text to the top results for the report
+        if enrich and search_results:
+            enrich_results(search_results)
+    
+        # Prepare the results to return
+        result_package = {
+            'query': query,
+            'search_date': current_date,
+            'results': search_results,
+            'missing_sources': missing_sources,
+            'analysis_prompt': writing_task
+        }
+    
+        # Only cache complete answers so a failed or timed-out source is retried on the next request
+        if search_results and not missing_sources:
+            result_cache.set(cache_key, copy.deepcopy(result_package))
     
-    return result_package
\ No newline at end of file
+        return result_package
\ No newline at end of file
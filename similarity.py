@@ -0,0 +1,77 @@
+import hashlib
+import re
+import numpy as np
+
+# Universal hashing modulo a prime just below 2**32 keeps a*x + b inside uint64
+_PRIME = np.uint64(4294967291)
+_WORD_RE = re.compile(r"\w+")
+
+def _token_hashes(tokens):
+    """Hash each token to a 32-bit integer"""
+    return np.fromiter(
+        (int.from_bytes(hashlib.blake2b(token.encode('utf-8'), digest_size=4).digest(), 'little') for token in tokens),
+        dtype=np.uint64,
+    )
+
+def shingles(text, size=3):
+    """Return the set of overlapping word n-grams in text"""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+class MinHasher:
+    """Compute fixed-length MinHash signatures whose agreement estimates Jaccard similarity"""
+
+    def __init__(self, num_perm=64, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self._a = rng.integers(1, int(_PRIME), size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, int(_PRIME), size=num_perm, dtype=np.uint64)
+
+    def signature(self, features):
+        """Return the MinHash signature of a set of string features"""
+        if not features:
+            return np.full(self.num_perm, int(_PRIME), dtype=np.uint64)
+        hashes = _token_hashes(features)
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1)
+
+def jaccard(sig_a, sig_b):
+    """Estimate the Jaccard similarity of two MinHash signatures"""
+    return float(np.count_nonzero(sig_a == sig_b)) / len(sig_a)
+
+class LSHIndex:
+    """
+    Banded locality-sensitive hashing over MinHash signatures.
+    Items sharing any band are returned as candidates for an exact similarity check.
+    """
+
+    def __init__(self, num_perm=64, bands=16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets = [{} for _ in range(bands)]
+
+    def _band_keys(self, signature):
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def add(self, item, signature):
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            bucket.setdefault(key, set()).add(item)
+
+    def remove(self, item, signature):
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            items = bucket.get(key)
+            if items is not None:
+                items.discard(item)
+                if not items:
+                    del bucket[key]
+
+    def candidates(self, signature):
+        """Return every indexed item sharing at least one band with signature"""
+        found = set()
+        for bucket, key in zip(self._buckets, self._band_keys(signature)):
+            found.update(bucket.get(key, ()))
+        return found
@@ -0,0 +1,111 @@
+import threading
+from concurrent.futures import Future
+import tracing
+
+class _Broadcast:
+    """Chunks of one in-flight stream; every subscriber replays them from the start"""
+
+    def __init__(self):
+        self.chunks = []
+        self.finished = False
+        self._cond = threading.Condition()
+
+    def publish(self, chunk):
+        with self._cond:
+            self.chunks.append(chunk)
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.finished = True
+            self._cond.notify_all()
+
+    def __iter__(self):
+        index = 0
+        while True:
+            with self._cond:
+                while index >= len(self.chunks) and not self.finished:
+                    self._cond.wait()
+                if index >= len(self.chunks):
+                    return
+                chunk = self.chunks[index]
+            index += 1
+            yield chunk
+
+class SingleFlight:
+    """
+    Collapse concurrent calls with the same key into one.
+    The first caller runs the function; callers arriving while it is in flight wait for
+    it and share its result or exception. Nothing is kept once the call finishes.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.collapsed = 0
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+    def _join(self, key, make):
+        # Return (in-flight value, True) for followers or (new value, False) for the leader
+        with self._lock:
+            self.calls += 1
+            value = self._inflight.get(key)
+            if value is not None:
+                self.collapsed += 1
+                return value, True
+            value = make()
+            self._inflight[key] = value
+            return value, False
+
+    def _leave(self, key):
+        with self._lock:
+            self._inflight.pop(key, None)
+
+    def do(self, key, fn, *args, **kwargs):
+        """
+        Call fn(*args, **kwargs) unless a call with this key is already running.
+        Returns (result, shared); shared is True for callers that got another call's result,
+        which they must copy before mutating.
+        """
+        future, shared = self._join(key, Future)
+        if shared:
+            with tracing.span("singleflight", flight=self.name, shared=True):
+                return future.result(), True
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            self._leave(key)
+        return result, False
+
+    def stream(self, key, fn, *args, **kwargs):
+        """
+        Yield the chunks of fn(*args, **kwargs), sharing one upstream stream among
+        concurrent callers with the same key. The stream is read on its own thread,
+        so a caller that stops early doesn't cut it short for the others.
+        """
+        broadcast, shared = self._join(key, _Broadcast)
+        if not shared:
+            def pump():
+                try:
+                    for chunk in fn(*args, **kwargs):
+                        broadcast.publish(chunk)
+                except Exception as e:
+                    print(f"Error in shared stream {self.name}: {str(e)}")
+                finally:
+                    self._leave(key)
+                    broadcast.close()
+
+            threading.Thread(target=tracing.propagate(pump), name=f"flight-{self.name}", daemon=True).start()
+        yield from broadcast
+
+    def stats(self):
+        """Return call, collapsed-call and in-flight counts"""
+        with self._lock:
+            return {'calls': self.calls, 'collapsed': self.collapsed, 'inflight': len(self._inflight)}
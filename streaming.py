@@ -0,0 +1,108 @@
+import hashlib
+import threading
+import time
+from openai import OpenAI
+import tracing
+
+# Seconds to wait for the first byte and between chunks of a streamed completion
+STREAM_TIMEOUT = 60
+
+# One HTTP client per endpoint and API key, shared by every stream
+_clients = {}
+_clients_lock = threading.Lock()
+
+class TextStream:
+    """Iterate over streamed text chunks while keeping the full text received so far"""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self.text = ""
+        self.done = False
+
+    def __iter__(self):
+        for chunk in self._chunks:
+            self.text += chunk
+            yield chunk
+        self.done = True
+
+    def __str__(self):
+        return self.text
+
+def agent_model(agent):
+    """Return the model name configured for an agent, or None"""
+    config_list = (agent.llm_config or {}).get('config_list') or [{}]
+    return config_list[0].get('model')
+
+def _endpoint_key(config):
+    # autogen validates llm_config, so base_url arrives as a URL object
+    api_key = str(config.get('api_key') or '')
+    base_url = str(config.get('base_url')) if config.get('base_url') else None
+    return base_url, hashlib.sha256(api_key.encode('utf-8')).hexdigest()
+
+def agent_endpoint(agent):
+    """Identify the model, endpoint and credentials an agent uses, without keeping the raw API key"""
+    config_list = (agent.llm_config or {}).get('config_list') or [{}]
+    return (config_list[0].get('model'),) + _endpoint_key(config_list[0])
+
+def _get_client(config):
+    base_url, api_key_hash = _endpoint_key(config)
+    api_key = str(config.get('api_key') or '')
+    key = (base_url, api_key_hash)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = OpenAI(api_key=api_key, base_url=base_url, timeout=STREAM_TIMEOUT, max_retries=1)
+            _clients[key] = client
+        return client
+
+def stream_chat(agent, prompt, fallback=None, span_name="stream", cache=None):
+    """
+    Stream the agent's answer to a single prompt from its OpenAI-compatible endpoint.
+    Yields text chunks as they arrive. With a response cache, complete answers are stored
+    and replayed in one chunk next time. If the request fails before any text arrives,
+    yields `fallback()` instead when a fallback is given.
+    """
+    config = agent.llm_config['config_list'][0]
+    messages = [
+        {'role': 'system', 'content': agent.system_message},
+        {'role': 'user', 'content': prompt},
+    ]
+    cache_key = {'model': config.get('model'), 'messages': messages, 'stream': True}
+
+    with tracing.span(span_name, agent=agent.name, model=config.get('model')) as stream_span:
+        cached = cache.get(cache_key) if cache is not None else None
+        if cached:
+            stream_span.set(cached=True, chars=len(cached))
+            yield cached
+            return
+
+        started = time.perf_counter()
+        parts = []
+        try:
+            response = _get_client(config).chat.completions.create(
+                model=config.get('model'),
+                messages=messages,
+                stream=True,
+            )
+            for chunk in response:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if not delta:
+                    continue
+                if not parts:
+                    stream_span.set(ttft_ms=round((time.perf_counter() - started) * 1000, 1))
+                parts.append(delta)
+                yield delta
+        except Exception as e:
+            print(f"Error streaming from {agent.name}: {str(e)}")
+            if not parts and fallback is not None:
+                text = fallback()
+                stream_span.set(fallback=True, chars=len(text))
+                yield text
+            return
+
+        text = "".join(parts)
+        stream_span.set(chars=len(text))
+        if text and cache is not None:
+            cache.set(cache_key, text)
@@ -0,0 +1,44 @@
+import re
+
+class TermCounter:
+    """
+    Count whole-word occurrences of many terms with a single precompiled regex.
+    Matching ignores case, so 'ETF' and 'etf' count the same, and multi-word phrases
+    count their shorter terms too ('bull market' also counts 'market'), exactly as
+    running a separate word-boundary search for every term would.
+    """
+
+    def __init__(self, terms):
+        self.terms = list(dict.fromkeys(terms))
+
+        # Terms sharing a spelling up to case are counted together
+        self._by_key = {}
+        for term in self.terms:
+            self._by_key.setdefault(term.lower(), []).append(term)
+
+        # Longest alternatives first, so each position reports the longest term starting there.
+        # The lookahead doesn't consume text, so terms starting inside a match are still found.
+        keys = sorted(self._by_key, key=len, reverse=True)
+        alternation = "|".join(re.escape(key) for key in keys)
+        self._pattern = re.compile(r"\b(?=(" + alternation + r")\b)", re.IGNORECASE)
+
+        # Shorter terms that also match wherever a longer term starting at the same word does
+        self._prefixes = {
+            key: [other for other in keys if other != key and re.match(re.escape(other) + r"\b", key)]
+            for key in keys
+        }
+
+    def count(self, text):
+        """Return a dict mapping every term to its number of whole-word occurrences in text"""
+        key_counts = dict.fromkeys(self._by_key, 0)
+        for match in self._pattern.finditer(text):
+            key = match.group(1).lower()
+            key_counts[key] += 1
+            for prefix in self._prefixes[key]:
+                key_counts[prefix] += 1
+
+        counts = {}
+        for key, terms in self._by_key.items():
+            for term in terms:
+                counts[term] = key_counts[key]
+        return counts
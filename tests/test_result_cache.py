@@ -0,0 +1,23 @@
+import copy
+from unittest import mock
+
+import search_engine
+from cache import TieredCache
+
+
+def test_enriched_search_does_not_reuse_plain_package():
+    results = [{'title': 'Battery prices fall', 'link': 'https://example.com/a', 'snippet': 'EV batteries', 'source': 'News'}]
+
+    def enrich(search_results):
+        for result in search_results:
+            result['content'] = "Full article text"
+
+    with mock.patch.object(search_engine, 'result_cache', TieredCache(maxsize=8, ttl=60)), \
+            mock.patch.object(search_engine, 'search_web_sources', side_effect=lambda *args, **kwargs: (copy.deepcopy(results), [])) as search, \
+            mock.patch.object(search_engine, 'enrich_results', side_effect=enrich):
+        plain = search_engine.run_search(None, "ev batteries", "2025-01-01", enrich=False)
+        enriched = search_engine.run_search(None, "ev batteries", "2025-01-01", enrich=True)
+
+    assert search.call_count == 2
+    assert 'content' not in plain['results'][0]
+    assert enriched['results'][0]['content'] == "Full article text"
@@ -0,0 +1,50 @@
+import re
+from collections import Counter
+from cache import TTLCache
+
+# Common words left out of word-frequency analysis
+STOPWORDS = frozenset([
+    'the', 'a', 'an', 'and', 'or', 'but', 'is', 'are', 'was', 'were', 'been', 'being',
+    'have', 'has', 'had', 'do', 'does', 'did', 'doing', 'to', 'from', 'by', 'with',
+    'about', 'against', 'between', 'into', 'through', 'during', 'before', 'after',
+    'above', 'below', 'of', 'at', 'in', 'on', 'for', 'this', 'that', 'these', 'those',
+    'it', 'its', 'they', 'them', 'their', 'which', 'who', 'whom', 'what', 'when', 'where'
+])
+
+# Words this short are too generic to count
+MIN_WORD_LENGTH = 3
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+# Corpora of recent result sets, so the report and the chart share one build per query
+_corpus_cache = TTLCache(maxsize=32, ttl=15 * 60)
+
+class Corpus:
+    """Lowercased text of a result set with its tokens and word frequencies"""
+
+    __slots__ = ('text', 'tokens', 'words', 'word_counts')
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = _PUNCTUATION.sub('', text).split()
+        self.words = [word for word in self.tokens if len(word) >= MIN_WORD_LENGTH and word not in STOPWORDS]
+        self.word_counts = Counter(self.words)
+
+def build_corpus(results):
+    """Build the corpus of a list of results from their titles, snippets and extracted page text"""
+    parts = []
+    for result in results:
+        parts.append(result.get('title', ''))
+        parts.append(result.get('snippet', ''))
+        if result.get('content'):
+            parts.append(result['content'])
+    return Corpus((" ".join(parts) + " ").lower())
+
+def get_corpus(results):
+    """Return the corpus for a list of results, building it only once per result set"""
+    key = tuple((result.get('title', ''), result.get('snippet', ''), result.get('content', '')) for result in results)
+    corpus = _corpus_cache.get(key)
+    if corpus is None:
+        corpus = build_corpus(results)
+        _corpus_cache.set(key, corpus)
+    return corpus
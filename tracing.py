@@ -0,0 +1,211 @@
+import contextvars
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+# Exporters receive every finished span; tracing is off while the list is empty
+_exporters = []
+_enabled = False
+
+_current_span = contextvars.ContextVar("current_span", default=None)
+_ids = itertools.count(1)
+
+logger = logging.getLogger("search.trace")
+
+class Span:
+    """A timed pipeline stage with attributes such as byte and result counts"""
+
+    __slots__ = ('name', 'attrs', 'span_id', 'trace_id', 'parent_id', 'start', 'duration_ms', 'error', '_started', '_token')
+
+    def __init__(self, name, attrs):
+        self.name = name
+        self.attrs = attrs
+        self.span_id = next(_ids)
+        self.error = None
+        self.duration_ms = None
+
+        parent = _current_span.get()
+        self.parent_id = parent.span_id if parent else None
+        self.trace_id = parent.trace_id if parent else self.span_id
+
+    def set(self, **attrs):
+        """Attach or overwrite attributes on the span"""
+        self.attrs.update(attrs)
+
+    def add_bytes(self, count):
+        """Accumulate a byte count, e.g. the size of a downloaded body"""
+        self.attrs['bytes'] = self.attrs.get('bytes', 0) + count
+
+    def __enter__(self):
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration_ms = (time.perf_counter() - self._started) * 1000
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.error = f"{exc_type.__name__}: {exc}"
+        for exporter in _exporters:
+            try:
+                exporter.export(self)
+            except Exception as e:
+                print(f"Error exporting trace span: {str(e)}")
+        return False
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': self.start,
+            'duration_ms': round(self.duration_ms, 3),
+            'error': self.error,
+            **self.attrs,
+        }
+
+class _NoopSpan:
+    """Shared stand-in returned while tracing is disabled"""
+
+    __slots__ = ()
+
+    def set(self, **attrs):
+        pass
+
+    def add_bytes(self, count):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+_NOOP_SPAN = _NoopSpan()
+
+def span(name, **attrs):
+    """
+    Time a pipeline stage:
+
+        with tracing.span("fetch", source="News") as s:
+            s.add_bytes(len(body))
+
+    Returns a shared no-op object while tracing is disabled.
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return Span(name, attrs)
+
+def propagate(fn):
+    """Bind fn to the current trace so spans opened in a worker thread keep their parent"""
+    if not _enabled:
+        return fn
+    context = contextvars.copy_context()
+    def run(*args, **kwargs):
+        return context.run(fn, *args, **kwargs)
+    return run
+
+class LogExporter:
+    """Write one log line per finished span"""
+
+    def __init__(self, log=None, level=logging.INFO):
+        self.log = log or logger
+        self.level = level
+
+    def export(self, finished):
+        attrs = " ".join(f"{key}={value}" for key, value in finished.attrs.items())
+        error = f" error={finished.error!r}" if finished.error else ""
+        self.log.log(self.level, "trace=%s span=%s %.1fms %s%s",
+                     finished.trace_id, finished.name, finished.duration_ms, attrs, error)
+
+class JSONLExporter:
+    """Append each finished span as one JSON object per line"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+
+    def export(self, finished):
+        line = json.dumps(finished.to_dict(), default=str)
+        with self._lock, open(self.path, 'a', encoding='utf-8') as f:
+            f.write(line + "\n")
+
+class MemoryExporter:
+    """Keep the most recent spans in memory for the in-app diagnostics panel"""
+
+    def __init__(self, maxlen=500):
+        self.spans = deque(maxlen=maxlen)
+
+    def export(self, finished):
+        self.spans.append(finished.to_dict())
+
+    def traces(self, session_id=None):
+        """
+        Return finished spans grouped by trace, most recent trace first.
+        The exporter is shared by every session; with a session_id only traces whose root span
+        was tagged with it are returned, so one user's queries don't show up for another.
+        """
+        grouped = {}
+        for finished in list(self.spans):
+            grouped.setdefault(finished['trace_id'], []).append(finished)
+        if session_id is not None:
+            grouped = {
+                trace_id: spans for trace_id, spans in grouped.items()
+                if any(s['parent_id'] is None and s.get('session_id') == session_id for s in spans)
+            }
+        return [
+            sorted(spans, key=lambda s: s['start'])
+            for _, spans in sorted(grouped.items(), reverse=True)
+        ]
+
+def enable(*exporters):
+    """Turn tracing on and register exporters"""
+    global _enabled
+    _exporters.extend(exporters)
+    _enabled = bool(_exporters)
+
+def disable():
+    """Turn tracing off and drop every exporter"""
+    global _enabled
+    _enabled = False
+    _exporters.clear()
+
+def is_enabled():
+    return _enabled
+
+def get_exporter(kind):
+    """Return the first registered exporter of the given class, or None"""
+    for exporter in _exporters:
+        if isinstance(exporter, kind):
+            return exporter
+    return None
+
+def configure_from_env():
+    """
+    Enable exporters listed in SEARCH_TRACING (comma-separated: log, jsonl, panel).
+    The JSONL exporter writes to SEARCH_TRACE_FILE (default .cache/traces.jsonl).
+    Calling it again is a no-op once tracing is enabled.
+    """
+    if _enabled:
+        return
+    exporters = []
+    for kind in os.environ.get("SEARCH_TRACING", "").split(","):
+        kind = kind.strip().lower()
+        if kind == 'log':
+            logging.basicConfig(level=logging.INFO)
+            exporters.append(LogExporter())
+        elif kind == 'jsonl':
+            exporters.append(JSONLExporter(os.environ.get("SEARCH_TRACE_FILE", os.path.join(".cache", "traces.jsonl"))))
+        elif kind == 'panel':
+            exporters.append(MemoryExporter())
+    if exporters:
+        enable(*exporters)
@@ -0,0 +1,259 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from urllib3.util.retry import Retry
+
+# Headers to mimic a browser visit, shared by every outbound request
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+DEFAULT_TIMEOUT = 10
+
+# Connection pool sizing: number of hosts kept alive and sockets allowed per host
+POOL_HOSTS = 8
+MAX_CONNECTIONS_PER_HOST = 6
+
+# Retry policy for throttling and transient server errors
+RETRY_TOTAL = 3
+RETRY_BACKOFF = 0.5
+RETRY_JITTER = 0.5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# Conditional response cache; set HTTP_CACHE_DIR to an empty string to disable it
+HTTP_CACHE_DIR = os.environ.get("HTTP_CACHE_DIR", os.path.join(".cache", "http"))
+HTTP_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+_session = None
+_session_lock = threading.Lock()
+_response_cache = None
+
+def _build_retry():
+    """Build the retry policy, adding jitter where the installed urllib3 supports it"""
+    retry_args = {
+        'total': RETRY_TOTAL,
+        'connect': RETRY_TOTAL,
+        'read': RETRY_TOTAL,
+        'status': RETRY_TOTAL,
+        'backoff_factor': RETRY_BACKOFF,
+        'status_forcelist': RETRY_STATUSES,
+        'allowed_methods': frozenset(['GET', 'HEAD']),
+        'respect_retry_after_header': True,
+        # Hand the final 429/5xx back to the caller so raise_for_status reports it
+        'raise_on_status': False,
+    }
+    try:
+        return Retry(backoff_jitter=RETRY_JITTER, **retry_args)
+    except TypeError:
+        # urllib3 < 2 has no jitter support; fall back to plain exponential backoff
+        return Retry(**retry_args)
+
+def _build_session():
+    """Create a keep-alive session with bounded per-host pools and retries"""
+    session = requests.Session()
+    session.headers.update(DEFAULT_HEADERS)
+
+    adapter = HTTPAdapter(
+        pool_connections=POOL_HOSTS,
+        pool_maxsize=MAX_CONNECTIONS_PER_HOST,
+        pool_block=True,
+        max_retries=_build_retry(),
+    )
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_session():
+    """Return the process-wide pooled session, creating it on first use"""
+    global _session
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                _session = _build_session()
+    return _session
+
+def install_session(session):
+    """Replace the shared session, e.g. with one serving recorded fixtures; returns the previous one"""
+    global _session
+    with _session_lock:
+        previous, _session = _session, session
+    return previous
+
+class ResponseCache:
+    """
+    Size-bounded on-disk store of zlib-compressed response bodies keyed by URL.
+    Only responses carrying an ETag or Last-Modified validator are kept, so every
+    reuse is revalidated upstream with If-None-Match / If-Modified-Since.
+    """
+
+    def __init__(self, directory, max_bytes=HTTP_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.revalidated = 0
+        self._lock = threading.Lock()
+
+        if not os.path.exists(directory):
+            os.makedirs(directory)
+        self.path = os.path.join(directory, "responses.sqlite")
+
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, url TEXT NOT NULL, etag TEXT, last_modified TEXT, "
+                "headers TEXT NOT NULL, encoding TEXT, body BLOB NOT NULL, "
+                "size INTEGER NOT NULL, accessed_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self):
+        """Open a connection that commits on success and is always closed"""
+        conn = sqlite3.connect(self.path, timeout=5)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def lookup(self, url):
+        """Return the stored entry for url as a dict, or None"""
+        with self._lock, self._connect() as conn:
+            row = conn.execute(
+                "SELECT etag, last_modified, headers, encoding, body FROM responses WHERE key = ?",
+                (self._key(url),)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            'etag': row[0],
+            'last_modified': row[1],
+            'headers': json.loads(row[2]),
+            'encoding': row[3],
+            'body': row[4],
+        }
+
+    def validators(self, entry):
+        """Return the conditional request headers for a stored entry"""
+        headers = {}
+        if entry['etag']:
+            headers['If-None-Match'] = entry['etag']
+        if entry['last_modified']:
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def store(self, url, response):
+        """Compress and store a 200 response that carries cache validators"""
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if response.status_code != 200 or not (etag or last_modified):
+            return
+
+        body = zlib.compress(response.content)
+        headers = {
+            name: value for name, value in response.headers.items()
+            if name.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')
+        }
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO responses "
+                "(key, url, etag, last_modified, headers, encoding, body, size, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (self._key(url), url, etag, last_modified, json.dumps(headers),
+                 response.encoding, body, len(body), time.time())
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        """Drop least recently used entries until the stored bodies fit the byte budget"""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = conn.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+
+    def replay(self, url, entry, revalidation):
+        """Build a 200 response from a stored entry after the upstream answered 304"""
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                (time.time(), self._key(url))
+            )
+        self.revalidated += 1
+
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response.headers = CaseInsensitiveDict(entry['headers'])
+        # Validators may be refreshed on the 304 itself
+        for name in ('ETag', 'Last-Modified', 'Date', 'Cache-Control', 'Expires'):
+            if name in revalidation.headers:
+                response.headers[name] = revalidation.headers[name]
+        response.encoding = entry['encoding']
+        response._content = zlib.decompress(entry['body'])
+        response.request = revalidation.request
+        response.elapsed = revalidation.elapsed
+        response.from_cache = True
+        return response
+
+def get_response_cache():
+    """Return the shared response cache, or None when it is disabled"""
+    global _response_cache
+    if _response_cache is None and HTTP_CACHE_DIR:
+        with _session_lock:
+            if _response_cache is None:
+                try:
+                    _response_cache = ResponseCache(HTTP_CACHE_DIR)
+                except (OSError, sqlite3.Error) as e:
+                    print(f"HTTP response cache unavailable: {str(e)}")
+                    return None
+    return _response_cache
+
+def get(url, headers=None, timeout=DEFAULT_TIMEOUT, cache=True, **kwargs):
+    """
+    Issue a GET request through the shared pooled session.
+    With cache enabled, stored responses are revalidated and reused on 304 Not Modified.
+    """
+    response_cache = get_response_cache() if cache and not kwargs.get('stream') else None
+    if response_cache is None:
+        return get_session().get(url, headers=headers, timeout=timeout, **kwargs)
+
+    try:
+        entry = response_cache.lookup(url)
+    except sqlite3.Error as e:
+        print(f"Error reading HTTP cache: {str(e)}")
+        entry = None
+
+    request_headers = dict(headers or {})
+    if entry is not None:
+        request_headers.update(response_cache.validators(entry))
+
+    response = get_session().get(url, headers=request_headers, timeout=timeout, **kwargs)
+    try:
+        if response.status_code == 304 and entry is not None:
+            return response_cache.replay(url, entry, response)
+        response_cache.store(url, response)
+    except (sqlite3.Error, zlib.error) as e:
+        print(f"Error updating HTTP cache: {str(e)}")
+    return response
+
+def close_session():
+    """Close all pooled connections; the next request opens a fresh session"""
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
@@ -1,8 +1,8 @@
 import streamlit as st 
 import os
-import base64
-import io
+import time
 from datetime import datetime
+from rendering import render_spec, EXPORT_DPI, MIME_TYPES
 
 def setup_page():
     """Configure the Streamlit page settings with a modern UI."""
@@ -67,43 +67,136 @@ def setup_page():
     </style>
     """, unsafe_allow_html=True)
 
-def get_image_download_link(fig, filename="visualization.png", text="Download Visualization"):
-    """Generate a styled link to download a matplotlib figure."""
-    buf = io.BytesIO()
-    fig.savefig(buf, format='png', dpi=300, bbox_inches='tight')
-    buf.seek(0)
-    image_base64 = base64.b64encode(buf.getvalue()).decode('utf-8')
-    href = f'<a href="data:image/png;base64,{image_base64}" download="{filename}" class="stButton">{text}</a>'
-    return href
+@st.fragment
+def render_chart(search, filename="visualization"):
+    """
+    Show an interactive chart and PNG/SVG download buttons for a stored search.
+    The chart spec is drawn by plotly in the browser; download files are only rendered
+    server-side when a button is clicked, then kept with the search. Runs as a fragment,
+    so a download only reruns this section.
+    """
+    spec = search.visualization_data['spec']
+    key = search.visualization_data.get('key')
+    st.plotly_chart(spec, use_container_width=True)
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.download_button(
+            label="⬇️ Download PNG",
+            data=lambda: search.fragment('chart.png', lambda: render_spec(spec, 'png', EXPORT_DPI, key)),
+            file_name=f"{filename}.png",
+            mime=MIME_TYPES['png'],
+            use_container_width=True
+        )
+    with col2:
+        st.download_button(
+            label="⬇️ Download SVG",
+            data=lambda: search.fragment('chart.svg', lambda: render_spec(spec, 'svg', EXPORT_DPI, key)),
+            file_name=f"{filename}.svg",
+            mime=MIME_TYPES['svg'],
+            use_container_width=True
+        )
+
+def result_card_html(result):
+    """Build the HTML body of a search result card."""
+    return f"""
+        <div class='result-card'>
+            <h4>{result.get('title', 'No title')}</h4>
+            <p><strong>Link:</strong> <a href="{result.get('link', '#')}" target="_blank">{result.get('link', '#')}</a></p>
+            <p><strong>Snippet:</strong> {result.get('snippet', 'No snippet')}</p>
+            {f"<p><strong>Also reported by:</strong> {', '.join(result['sources'][1:])}</p>" if len(result.get('sources', [])) > 1 else ""}
+        </div>
+        """
+
+def render_result_card(result, card_html=None):
+    """Render a single search result as an expandable card, reusing prebuilt HTML when given."""
+    with st.expander(f"{result.get('title', 'No title')}"):
+        st.markdown(card_html or result_card_html(result), unsafe_allow_html=True)
+
+def render_stream(chunks, placeholder, min_interval=0.05):
+    """
+    Render streamed markdown into a placeholder as it arrives.
+    Redraws are throttled to one per `min_interval` seconds; returns the full text.
+    """
+    text = ""
+    last_render = 0.0
+    for chunk in chunks:
+        text += chunk
+        now = time.monotonic()
+        if now - last_render >= min_interval:
+            placeholder.markdown(text + "▌", unsafe_allow_html=True)
+            last_render = now
+    placeholder.markdown(text, unsafe_allow_html=True)
+    return text
 
-def display_results(search_results, report, visualization_data):
-    """Display search results, report, and visualizations in a structured format."""
+def display_results(search, report, review=None):
+    """
+    Display a stored search's results, report, and visualization in a structured format.
+    The report and review may be text or iterables of streamed chunks; result card HTML
+    is built once per search and reused on every rerun.
+    """
+    search_results = search.search_results
+    visualization_data = search.visualization_data
     tabs = st.tabs(["📊 Report", "🔍 Search Results", "📈 Visualization"])
     
-    with tabs[0]:
-        st.markdown("<div class='search-card'>", unsafe_allow_html=True)
-        st.markdown(report, unsafe_allow_html=True)
-        st.markdown("</div>", unsafe_allow_html=True)
-    
     with tabs[1]:
         st.header("Search Results from Multiple Sources")
+        if search_results and search_results.get('missing_sources'):
+            st.info(f"Some sources failed or did not respond in time: {', '.join(search_results['missing_sources'])}")
         if search_results and 'results' in search_results:
-            for result in search_results['results']:
-                with st.expander(f"{result.get('title', 'No title')}"):
-                    st.markdown(f"""
-                    <div class='result-card'>
-                        <h4>{result.get('title', 'No title')}</h4>
-                        <p><strong>Link:</strong> <a href="{result.get('link', '#')}" target="_blank">{result.get('link', '#')}</a></p>
-                        <p><strong>Snippet:</strong> {result.get('snippet', 'No snippet')}</p>
-                    </div>
-                    """, unsafe_allow_html=True)
+            cards = search.fragment('cards', lambda: [result_card_html(r) for r in search_results['results']])
+            for result, card_html in zip(search_results['results'], cards):
+                render_result_card(result, card_html)
         else:
             st.warning("No search results available.")
     
     with tabs[2]:
         st.header("Data Visualization")
-        if visualization_data and 'figure' in visualization_data:
-            st.pyplot(visualization_data['figure'])
-            st.markdown(get_image_download_link(visualization_data['figure']), unsafe_allow_html=True)
+        if visualization_data and 'spec' in visualization_data:
+            render_chart(search)
         else:
             st.warning("No visualization available.")
+    
+    # The report tab is filled last so the other tabs are ready while it streams
+    with tabs[0]:
+        st.markdown("<div class='search-card'>", unsafe_allow_html=True)
+        if isinstance(report, str):
+            st.markdown(report, unsafe_allow_html=True)
+        else:
+            render_stream(report, st.empty())
+        st.markdown("</div>", unsafe_allow_html=True)
+        
+        if review is not None:
+            st.markdown("#### 🧐 Reviewer Feedback")
+            if isinstance(review, str):
+                st.markdown(review)
+            else:
+                review = render_stream(review, st.empty())
+            if not review:
+                st.caption("No reviewer feedback available.")
+
+
+def display_diagnostics(trace_panel, session_id, max_traces=5):
+    """Show per-stage timings for this session's most recent traced queries."""
+    with st.expander("🩺 Diagnostics", expanded=False):
+        traces = trace_panel.traces(session_id)[:max_traces]
+        if not traces:
+            st.caption("No traced queries yet.")
+            return
+        for spans in traces:
+            root = next((s for s in spans if s['parent_id'] is None), spans[0])
+            st.markdown(f"**{root.get('query', root['name'])}** — {root['duration_ms']:.0f} ms")
+            st.dataframe(
+                [
+                    {
+                        'stage': s['name'],
+                        'source': s.get('source', ''),
+                        'ms': round(s['duration_ms'], 1),
+                        'bytes': s.get('bytes', ''),
+                        'error': s['error'] or '',
+                    }
+                    for s in spans
+                ],
+                hide_index=True,
+                use_container_width=True,
+            )
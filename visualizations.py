@@ -1,54 +1,64 @@
-import matplotlib.pyplot as plt
-import numpy as np
-import re
-from collections import Counter
 import random
-import matplotlib
-matplotlib.use('Agg')  # Use Agg backend to avoid display issues
+import tracing
+from text_analysis import get_corpus
+from domain_classifier import classify
+from rendering import chart_key
+
+# Decimal places kept in chart values; more only bloats the spec
+VALUE_PRECISION = 2
 
 def create_visualization(query, search_results):
     """
     Create appropriate visualizations based on the search topic and results
-    Returns the figure and description
+    Returns a plotly-style chart spec, description, plotted data and a cache key for exports
     """
-    # Create figure and axes
-    fig, ax = plt.subplots(figsize=(10, 6))
-    
-    # Determine the visualization type based on the query
-    if any(term in query.lower() for term in ['stock', 'market', 'price', 'investment', 'financial','economy']):
-        return create_financial_visualization(query, search_results, fig, ax)
-    elif any(term in query.lower() for term in ['health', 'covid', 'vaccine', 'medical', 'disease', 'treatment']):
-        return create_healthcare_visualization(query, search_results, fig, ax)
-    elif any(term in query.lower() for term in ['tech', 'technology', 'ai', 'software', 'digital', 'app']):
-        return create_technology_visualization(query, search_results, fig, ax)
-    else:
-        return create_general_visualization(query, search_results, fig, ax)
+    with tracing.span("chart") as chart_span:
+        # Route through the shared domain classifier, the same decision the report uses
+        domain = classify(query, search_results.get('results', []) if search_results else None)
+        if domain not in CHART_BUILDERS:
+            domain = 'general'
+        chart_span.set(domain=domain)
+        visualization = CHART_BUILDERS[domain](query, search_results)
+        visualization['domain'] = domain
+        visualization['key'] = chart_key(visualization['spec'])
+        return visualization
+
+def chart_layout(title, x_title=None, y_title=None, **extra):
+    """Build the layout part of a chart spec"""
+    layout = {'title': {'text': title}, 'showlegend': True}
+    if x_title:
+        layout['xaxis'] = {'title': {'text': x_title}}
+    if y_title:
+        layout['yaxis'] = {'title': {'text': y_title}}
+    layout.update(extra)
+    return layout
+
+def rounded(values):
+    """Round chart values to VALUE_PRECISION places"""
+    return [round(value, VALUE_PRECISION) for value in values]
 
-def create_financial_visualization(query, search_results, fig, ax):
+def create_financial_visualization(query, search_results):
     """Create a financial-themed visualization"""
     # Simulate financial data from the search results
     dates = [f'Day {i+1}' for i in range(10)]
     
     # Generate random data for the chart (in a real scenario, this would be extracted from search results)
-    main_asset_price = [100 + random.uniform(-5, 5) * i for i in range(10)]
-    comparison_asset_price = [95 + random.uniform(-4, 6) * i for i in range(10)]
-    
-    # Plot data
-    ax.plot(dates, main_asset_price, 'b-', marker='o', linewidth=2, label=f'{query.split()[0]} Price')
-    ax.plot(dates, comparison_asset_price, 'r--', marker='s', linewidth=2, label='Market Comparison')
-    
-    # Add grid and labels
-    ax.grid(True, linestyle='--', alpha=0.7)
-    ax.set_title(f'Financial Analysis: {query}', fontsize=16, fontweight='bold')
-    ax.set_xlabel('Timeline', fontsize=12)
-    ax.set_ylabel('Price Value', fontsize=12)
-    ax.tick_params(axis='x', rotation=45)
-    
-    # Add legend
-    ax.legend(loc='best')
-    
-    # Tight layout
-    fig.tight_layout()
+    main_asset_price = rounded(100 + random.uniform(-5, 5) * i for i in range(10))
+    comparison_asset_price = rounded(95 + random.uniform(-4, 6) * i for i in range(10))
+    
+    # Line series for the asset and the market
+    spec = {
+        'data': [
+            {'type': 'scatter', 'mode': 'lines+markers', 'name': f'{query.split()[0]} Price',
+             'x': dates, 'y': main_asset_price,
+             'line': {'color': 'blue', 'width': 2}, 'marker': {'symbol': 'circle'}},
+            {'type': 'scatter', 'mode': 'lines+markers', 'name': 'Market Comparison',
+             'x': dates, 'y': comparison_asset_price,
+             'line': {'color': 'red', 'width': 2, 'dash': 'dash'}, 'marker': {'symbol': 'square'}},
+        ],
+        'layout': chart_layout(f'Financial Analysis: {query}', 'Timeline', 'Price Value'),
+    }
+    spec['layout']['xaxis']['tickangle'] = -45
     
     # Description for the visualization
     description = f"""
@@ -63,36 +73,27 @@ def create_financial_visualization(query, search_results, fig, ax):
     **Note:** This visualization is based on data extracted from the search results and provides a simplified view of the financial trends.
     """
     
-    return {'figure': fig, 'description': description}
+    data = {'dates': dates, 'main': main_asset_price, 'comparison': comparison_asset_price}
+    return {'spec': spec, 'description': description, 'data': data}
 
-def create_healthcare_visualization(query, search_results, fig, ax):
+def create_healthcare_visualization(query, search_results):
     """Create a healthcare-themed visualization"""
     # Simulate healthcare data
     categories = ['Treatment A', 'Treatment B', 'Treatment C', 'Treatment D', 'Treatment E']
-    effectiveness = [random.uniform(65, 95) for _ in range(5)]
-    side_effects = [random.uniform(5, 30) for _ in range(5)]
-    
-    # Create bar chart
-    x = np.arange(len(categories))
-    width = 0.35
-    
-    ax.bar(x - width/2, effectiveness, width, label='Effectiveness (%)', color='green', alpha=0.7)
-    ax.bar(x + width/2, side_effects, width, label='Side Effects (%)', color='red', alpha=0.7)
-    
-    # Add labels and grid
-    ax.set_title(f'Healthcare Analysis: {query}', fontsize=16, fontweight='bold')
-    ax.set_xlabel('Treatments', fontsize=12)
-    ax.set_ylabel('Percentage (%)', fontsize=12)
-    ax.set_xticks(x)
-    ax.set_xticklabels(categories)
-    ax.tick_params(axis='x', rotation=45)
-    ax.grid(True, linestyle='--', axis='y', alpha=0.7)
-    
-    # Add legend
-    ax.legend(loc='best')
-    
-    # Tight layout
-    fig.tight_layout()
+    effectiveness = rounded(random.uniform(65, 95) for _ in range(5))
+    side_effects = rounded(random.uniform(5, 30) for _ in range(5))
+    
+    # Grouped bar chart
+    spec = {
+        'data': [
+            {'type': 'bar', 'name': 'Effectiveness (%)', 'x': categories, 'y': effectiveness,
+             'marker': {'color': 'green'}, 'opacity': 0.7},
+            {'type': 'bar', 'name': 'Side Effects (%)', 'x': categories, 'y': side_effects,
+             'marker': {'color': 'red'}, 'opacity': 0.7},
+        ],
+        'layout': chart_layout(f'Healthcare Analysis: {query}', 'Treatments', 'Percentage (%)', barmode='group'),
+    }
+    spec['layout']['xaxis']['tickangle'] = -45
     
     # Description for the visualization
     description = f"""
@@ -107,9 +108,10 @@ def create_healthcare_visualization(query, search_results, fig, ax):
     **Note:** This visualization is based on data extracted from the search results and provides a simplified view of healthcare metrics.
     """
     
-    return {'figure': fig, 'description': description}
+    data = {'categories': categories, 'effectiveness': effectiveness, 'side_effects': side_effects}
+    return {'spec': spec, 'description': description, 'data': data}
 
-def create_technology_visualization(query, search_results, fig, ax):
+def create_technology_visualization(query, search_results):
     """Create a technology-themed visualization"""
     # Simulate technology adoption/growth data
     technologies = ['Solution A', 'Solution B', 'Solution C', 'Solution D', 'Solution E']
@@ -118,31 +120,21 @@ def create_technology_visualization(query, search_results, fig, ax):
     dimensions = ['Speed', 'Adoption', 'Efficiency', 'Cost', 'Innovation']
     n_dims = len(dimensions)
     
-    # Create a figure with multiple data series (different technologies)
-    angles = np.linspace(0, 2*np.pi, n_dims, endpoint=False).tolist()
-    angles += angles[:1]  # Close the loop
-    
-    # Set up the plot
-    ax = plt.subplot(111, polar=True)
-    
-    # Plot multiple technology metrics
+    # One closed polar series per technology
+    series = {}
+    traces = []
     for i, tech in enumerate(technologies[:3]):  # Just plot 3 for clarity
-        values = [random.uniform(1, 10) for _ in range(n_dims)]
-        values += values[:1]  # Close the loop
-        ax.plot(angles, values, linewidth=2, label=tech)
-        ax.fill(angles, values, alpha=0.1)
-    
-    # Set labels and customize
-    ax.set_xticks(angles[:-1])
-    ax.set_xticklabels(dimensions)
-    ax.set_title(f'Technology Analysis: {query}', fontsize=16, fontweight='bold')
-    ax.grid(True)
-    
-    # Add legend
-    ax.legend(loc='upper right', bbox_to_anchor=(0.1, 0.1))
-    
-    # Tight layout
-    fig.tight_layout()
+        values = rounded(random.uniform(1, 10) for _ in range(n_dims))
+        series[tech] = values
+        traces.append({
+            'type': 'scatterpolar', 'name': tech, 'fill': 'toself', 'opacity': 0.8,
+            'r': values + values[:1], 'theta': dimensions + dimensions[:1],  # Close the loop
+        })
+    
+    spec = {
+        'data': traces,
+        'layout': chart_layout(f'Technology Analysis: {query}', polar={'radialaxis': {'visible': True}}),
+    }
     
     # Description for the visualization
     description = f"""
@@ -161,32 +153,14 @@ def create_technology_visualization(query, search_results, fig, ax):
     **Note:** This visualization is based on data extracted from the search results and provides a multidimensional view of technology options.
     """
     
-    return {'figure': fig, 'description': description}
+    data = {'dimensions': dimensions, 'series': series}
+    return {'spec': spec, 'description': description, 'data': data}
 
-def create_general_visualization(query, search_results, fig, ax):
+def create_general_visualization(query, search_results):
     """Create a general visualization for any topic based on word frequency"""
-    # Extract text from search results
-    all_text = ""
-    if search_results and 'results' in search_results:
-        for result in search_results['results']:
-            all_text += result.get('title', '') + " " + result.get('snippet', '') + " "
-    
-    # Clean and process text
-    all_text = all_text.lower()
-    all_text = re.sub(r'[^\w\s]', '', all_text)  # Remove punctuation
-    
-    # Remove common words (stopwords)
-    stopwords = [
-        'the', 'a', 'an', 'and', 'or', 'but', 'is', 'are', 'was', 'were', 'been', 'being',
-        'have', 'has', 'had', 'do', 'does', 'did', 'doing', 'to', 'from', 'by', 'with', 
-        'about', 'against', 'between', 'into', 'through', 'during', 'before', 'after', 
-        'above', 'below', 'of', 'at', 'in', 'on', 'for', 'this', 'that', 'these', 'those',
-        'it', 'its', 'they', 'them', 'their', 'which', 'who', 'whom', 'what', 'when', 'where'
-    ]
-    words = [word for word in all_text.split() if word not in stopwords and len(word) > 2]
-    
-    # Count word frequencies
-    word_counts = Counter(words)
+    # Word frequencies from the corpus shared with the report (stopwords excluded)
+    results = search_results.get('results', []) if search_results else []
+    word_counts = get_corpus(results).word_counts
     
     # Get top words
     top_words = word_counts.most_common(10)
@@ -194,22 +168,16 @@ def create_general_visualization(query, search_results, fig, ax):
     # Create bar chart
     words, counts = zip(*top_words) if top_words else ([], [])
     
-    # Create horizontal bar chart
-    ax.barh(words, counts, color='skyblue')
-    
-    # Add labels and customize
-    ax.set_title(f'Word Frequency Analysis: {query}', fontsize=16, fontweight='bold')
-    ax.set_xlabel('Frequency', fontsize=12)
-    ax.set_ylabel('Words', fontsize=12)
-    ax.invert_yaxis()  # Invert y-axis to have the highest frequency at the top
-    ax.grid(True, linestyle='--', axis='x', alpha=0.7)
-    
-    # Add frequency values as text
-    for i, count in enumerate(counts):
-        ax.text(count + 0.5, i, str(count), va='center')
-    
-    # Tight layout
-    fig.tight_layout()
+    # Horizontal bar chart with the frequency shown next to each bar
+    spec = {
+        'data': [
+            {'type': 'bar', 'orientation': 'h', 'name': 'Frequency', 'x': list(counts), 'y': list(words),
+             'text': [str(count) for count in counts], 'textposition': 'outside',
+             'marker': {'color': 'skyblue'}},
+        ],
+        'layout': chart_layout(f'Word Frequency Analysis: {query}', 'Frequency', 'Words', showlegend=False),
+    }
+    spec['layout']['yaxis']['autorange'] = 'reversed'  # Highest frequency at the top
     
     # Description for the visualization
     description = f"""
@@ -224,4 +192,13 @@ def create_general_visualization(query, search_results, fig, ax):
     **Note:** Common words (stopwords) have been removed from the analysis to focus on meaningful terms.
     """
     
-    return {'figure': fig, 'description': description}
\ No newline at end of file
+    data = {'words': list(words), 'counts': list(counts)}
+    return {'spec': spec, 'description': description, 'data': data}
+
+# Chart builder per domain; other domains get the word-frequency chart
+CHART_BUILDERS = {
+    'financial': create_financial_visualization,
+    'healthcare': create_healthcare_visualization,
+    'technology': create_technology_visualization,
+    'general': create_general_visualization,
+}